@@ -0,0 +1,306 @@
+"""Season analytics over every order line, computed from one columnar fetch.
+
+The columns the reports need are read from Order once into parallel arrays
+(NumPy when it is installed, plain lists otherwise), with team, member and item
+replaced by small integer codes, and every report is a group-by over those
+arrays. The frame is cached per worker and keyed by the order data version
+(fragment_cache.py): a new order only costs fetching the rows after the last id
+seen, since submits take ids in commit order; archiving or backfilling existing
+rows rebuilds it.
+Archived seasons (archive.py) are read in when the frame is built.
+"""
+import threading
+from datetime import date, timedelta
+
+from sqlalchemy import Integer, cast, extract, func, select
+
+from archive import archive_version, archived_rows
+from fragment_cache import order_data_version
+from models import db, Order
+from reports import item_label
+from weeks import week_id_of, weeks_in_year, week_of, week_index_of
+
+# Complete weeks averaged for the "recent" burn rate
+RECENT_WEEKS = 4
+
+COLUMNS = ("week", "year", "team", "member", "item", "quantity", "spend")
+_INT_COLUMNS = ("week", "year", "team", "member", "item", "quantity")
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Encoder:
+    """Stable integer codes for repeated strings. Codes are only ever added, so
+    frames built earlier stay valid as new teams, members or items appear."""
+
+    def __init__(self):
+        self.codes = {}
+        self.values = []
+
+    def encode(self, values):
+        codes, out = self.codes, []
+        for value in values:
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+            out.append(code)
+        return out
+
+
+class OrderFrame:
+    """Order lines as parallel columns. Never modified once built; see extended()."""
+
+    def __init__(self, np, encoders=None, columns=None, last_id=0, archive=(), version=(0, 0)):
+        self.np = np
+        self.teams, self.members, self.items = encoders or (Encoder(), Encoder(), Encoder())
+        self.columns = columns or {name: self._empty(name) for name in COLUMNS}
+        self.last_id = last_id
+        # order_data_version() the rows were read at
+        self.version = version
+        # archive_version() of the seasons read in; see order_frame()
+        self.archive = archive
+
+    def _empty(self, name):
+        if self.np is None:
+            return []
+        return self.np.empty(0, dtype=self.np.int64 if name in _INT_COLUMNS else self.np.float64)
+
+    def __len__(self):
+        return len(self.columns["week"])
+
+    def years(self):
+        if self.np is None:
+            return sorted(set(self.columns["year"]))
+        return self.np.unique(self.columns["year"]).tolist()
+
+    def extended(self, rows, archived=False):
+        """A new frame with `rows` (from frame_stmt, in id order) appended.
+
+        Archived rows leave last_id alone; it tracks the live Order table only.
+        """
+        if not rows:
+            return self
+        ids, weeks, years, teams, members, names, options, quantities, prices = zip(*rows)
+        new = {
+            "week": weeks,
+            "year": years,
+            "team": self.teams.encode(teams),
+            "member": self.members.encode(members),
+            "item": self.items.encode(zip(names, (option or "" for option in options))),
+            "quantity": quantities,
+        }
+        np = self.np
+        if np is None:
+            new["spend"] = [q * p for q, p in zip(quantities, prices)]
+            columns = {name: self.columns[name] + list(new[name]) for name in COLUMNS}
+        else:
+            new = {name: np.asarray(values, dtype=np.int64) for name, values in new.items()}
+            new["spend"] = new["quantity"] * np.asarray(prices, dtype=np.float64)
+            columns = {name: np.concatenate((self.columns[name], new[name])) for name in COLUMNS}
+        return OrderFrame(np, (self.teams, self.members, self.items), columns,
+                          self.last_id if archived else ids[-1], self.archive, self.version)
+
+    # === Selection and grouping ===
+
+    def select(self, year=None, team=None, weeks=None):
+        """Rows for one budget year and/or team and/or week id range (first, last)."""
+        team_code = None
+        if team is not None:
+            team_code = self.teams.codes.get(team, -1)
+        cols, np = self.columns, self.np
+
+        if np is None:
+            return [
+                i for i in range(len(self))
+                if (year is None or cols["year"][i] == year)
+                and (team_code is None or cols["team"][i] == team_code)
+                and (weeks is None or weeks[0] <= cols["week"][i] <= weeks[1])
+            ]
+
+        mask = np.ones(len(self), dtype=bool)
+        if year is not None:
+            mask &= cols["year"] == year
+        if team_code is not None:
+            mask &= cols["team"] == team_code
+        if weeks is not None:
+            mask &= (cols["week"] >= weeks[0]) & (cols["week"] <= weeks[1])
+        return mask
+
+    def group_sum(self, keys, rows=None, values=("quantity", "spend")):
+        """{key codes: (sum of each value column)} over the selected rows."""
+        cols, np = self.columns, self.np
+
+        if np is None:
+            groups = {}
+            for i in (range(len(self)) if rows is None else rows):
+                key = tuple(cols[k][i] for k in keys)
+                sums = groups.get(key)
+                if sums is None:
+                    sums = groups[key] = [0] * len(values)
+                for j, v in enumerate(values):
+                    sums[j] += cols[v][i]
+            return {key: tuple(sums) for key, sums in groups.items()}
+
+        sel = slice(None) if rows is None else rows
+        key_cols = [cols[k][sel] for k in keys]
+        if len(key_cols[0]) == 0:
+            return {}
+        # Fold the key columns into one integer per row, then sum with bincount
+        lows = [int(c.min()) for c in key_cols]
+        dims = [int(c.max()) - low + 1 for c, low in zip(key_cols, lows)]
+        flat = np.ravel_multi_index([c - low for c, low in zip(key_cols, lows)], dims)
+        unique, inverse = np.unique(flat, return_inverse=True)
+        sums = [np.bincount(inverse, weights=cols[v][sel], minlength=len(unique)).tolist() for v in values]
+        key_lists = [(k + low).tolist() for k, low in zip(np.unravel_index(unique, dims), lows)]
+        return {key: tuple(s[i] for s in sums) for i, key in enumerate(zip(*key_lists))}
+
+
+# === Cached frame ===
+
+_lock = threading.Lock()
+_frame = None
+
+
+def frame_stmt(after_id=0):
+    week = func.coalesce(Order.week_id, week_index_of(Order.date))
+    return (
+        select(Order.id, week, cast(extract("year", Order.date), Integer), Order.team, Order.member,
+               Order.item_name, Order.option, Order.quantity, Order.price)
+        .where(Order.id > after_id)
+        .order_by(Order.id)
+    )
+
+
+def archived_frame_rows():
+    """frame_stmt's columns for every archived order line."""
+    rows = archived_rows(("id", "week_id", "date", "team", "member", "item_name", "option", "quantity", "price"))
+    return [(r.id, r.week_id, r.date.year, r.team, r.member, r.item_name, r.option, r.quantity, r.price)
+            for r in rows]
+
+
+def order_frame():
+    """Every order line, archived seasons included, as an OrderFrame fetched once and then topped up."""
+    global _frame
+    version = order_data_version()
+    archive = archive_version()
+    with _lock:
+        frame = _frame
+        if frame is None or version[1] != frame.version[1] or archive != frame.archive:
+            # First use, existing orders changed or went (a backfill, a season archived):
+            # start over, archived seasons first
+            frame = OrderFrame(_numpy(), archive=archive)
+            frame = frame.extended(archived_frame_rows(), archived=True)
+            frame = frame.extended(db.session.execute(frame_stmt(0)).all())
+        elif version != frame.version:
+            frame = frame.extended(db.session.execute(frame_stmt(frame.last_id)).all())
+        frame.version = version
+        _frame = frame
+        return frame
+
+
+def clear_frame():
+    global _frame
+    with _lock:
+        _frame = None
+
+
+# === Reports ===
+
+def season_team_weeks(frame, year):
+    """{team: {week number: spend}} over the weeks of `year`, same weeks as the weekly totals grid."""
+    first = week_id_of(year, 1)
+    rows = frame.select(weeks=(first, first + weeks_in_year(year) - 1))
+    grid = {}
+    for (team, week), (_, spend) in frame.group_sum(("team", "week"), rows).items():
+        grid.setdefault(frame.teams.values[team], {})[week - first + 1] = spend
+    return grid
+
+
+def top_items(frame, year, team=None, limit=10):
+    """The items with the most spend in `year` (for one team or everyone)."""
+    totals = frame.group_sum(("item",), frame.select(year=year, team=team))
+    ranked = sorted(totals.items(), key=lambda entry: -entry[1][1])[:limit]
+    return [{
+        "item": item_label(*frame.items.values[item]),
+        "quantity": int(quantity),
+        "spend": spend,
+    } for (item,), (quantity, spend) in ranked]
+
+
+def member_consumption(frame, year, team=None):
+    """Quantity, spend and weeks ordered per member in `year`, biggest spenders first."""
+    by_week = frame.group_sum(("team", "member", "week"), frame.select(year=year, team=team))
+    members = {}
+    for (team_code, member, _), (quantity, spend) in by_week.items():
+        entry = members.setdefault((team_code, member), [0, 0.0, 0])
+        entry[0] += quantity
+        entry[1] += spend
+        entry[2] += 1
+    rows = [{
+        "team": frame.teams.values[team_code],
+        "member": frame.members.values[member],
+        "quantity": int(quantity),
+        "spend": spend,
+        "weeks": weeks,
+        "per_week": spend / weeks,
+    } for (team_code, member), (quantity, spend, weeks) in members.items()]
+    return sorted(rows, key=lambda row: -row["spend"])
+
+
+def burn_rates(frame, budgets, today=None):
+    """Budget burn per team for this year, with a straight-line forecast.
+
+    The weekly rate is the average of the last RECENT_WEEKS complete weeks
+    (the season average when there are fewer). Returns one row per team in
+    `budgets` ({team: budget}) with what was spent, the projected total at year end and the
+    date the budget runs out at that rate (None when it lasts the year).
+    """
+    today = today or date.today()
+    year = today.year
+    this_week = week_of(today).id
+    year_start, year_end = date(year, 1, 1), date(year, 12, 31)
+    weeks_elapsed = max((today - year_start).days + 1, 1) / 7
+    weeks_left = (year_end - today).days / 7
+
+    spend = frame.group_sum(("team", "week"), frame.select(year=year), values=("spend",))
+    recent_weeks = (this_week - RECENT_WEEKS, this_week - 1)
+    spent, recent = {}, {}
+    for (team, week), (amount,) in spend.items():
+        name = frame.teams.values[team]
+        spent[name] = spent.get(name, 0.0) + amount
+        if recent_weeks[0] <= week <= recent_weeks[1]:
+            recent[name] = recent.get(name, 0.0) + amount
+
+    rows = []
+    for team, budget in budgets.items():
+        total = spent.get(team, 0.0)
+        if weeks_elapsed > RECENT_WEEKS:
+            rate = recent.get(team, 0.0) / RECENT_WEEKS
+        else:
+            rate = total / weeks_elapsed
+        projected = total + rate * weeks_left
+        remaining = budget - total
+        runs_out = None
+        if remaining <= 0:
+            runs_out = today
+        elif rate > 0:
+            day = today + timedelta(days=remaining / rate * 7)
+            runs_out = day if day <= year_end else None
+        rows.append({
+            "team": team,
+            "budget": budget,
+            "spent": total,
+            "remaining": remaining,
+            "weekly_rate": rate,
+            "projected": projected,
+            "projected_pct": projected / budget * 100 if budget else 0.0,
+            "runs_out": runs_out,
+        })
+    return sorted(rows, key=lambda row: -row["projected_pct"])
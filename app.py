@@ -1,20 +1,41 @@
-from flask import Flask, render_template, request, redirect, url_for, session, send_file
+from flask import (Blueprint, Flask, Response, current_app, render_template, request, redirect, url_for,
+                   session, jsonify, send_file, stream_with_context, flash)
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
-from openpyxl import Workbook, load_workbook
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from collections import OrderedDict
-from models import Order, db
-import json
+from sqlalchemy import insert
+from werkzeug.local import LocalProxy
+from models import Job, Order, db
+from config_store import ConfigStore
+from identity import ADMIN, RosterTable
+from menu_versions import MenuConflict, MenuPatchError, apply_menu_patch, menu_price
+from db_config import database_url, engine_options, pool_stats
+from metrics import init_instrumentation, stats as endpoint_stats
+from fragment_cache import bump_order_data_version, fragments, order_data_version
+from schema import upgrade_schema
+from exports import (CSV_MIMETYPE, XLSX_MIMETYPE, FileThenRemove, build_xlsx_file, iter_csv,
+                     produce_hyvee_export, weekly_summary_export)
+from reports import (ORDER_PAGE_SIZE, format_order_row, item_label, member_item_totals, member_week_lines,
+                     order_page, produce_hyvee_page, team_orders_page, weekly_summary_page, weekly_totals_page)
+from cart import (cart_form_data, cart_lines, clear_cart, parse_order_form, priced_items, qty_key, set_lines,
+                  sweep_expired_carts)
+from catalog import apply_renames, backfill_order_ids, get_catalog
+from ledger import (BudgetExceeded, backfill_order_weeks, budget_period, get_team_spent, record_order_rollup,
+                    record_order_spend, rebuild_ledger, rebuild_rollups, reserve_team_spend)
+from jobs import JOB_KINDS, DONE, init_jobs, job_status
+from archive import archive_season, init_archive, season_summaries
+from analytics import RECENT_WEEKS, burn_rates, member_consumption, order_frame, season_team_weeks, top_items
+from weeks import current_week, week_index, weeks_of_year
+import click
 import os
-from io import BytesIO
 
-app = Flask(__name__)
-app.secret_key = 'your-secret-key'
+# Every view and CLI command lives on this blueprint; create_app() builds the app around it.
+# cli_group=None keeps the commands at the top level (`flask upgrade-db`, not `flask main upgrade-db`)
+bp = Blueprint('main', __name__, cli_group=None)
 
 # Flask-Login setup
 login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
+login_manager.login_view = 'main.login'
 
 # Dummy user class using team name as ID
 class User(UserMixin):
@@ -24,404 +45,315 @@ class User(UserMixin):
 
 @login_manager.user_loader
 def load_user(user_id):
-    # Get team from session or fallback to dummy
-    team = session.get("team", "Unknown Team")
-    return User(user_id, team)
-
-app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-db.init_app(app)
-
-# Constants
-EXCEL_DIR = 'user_orders'
-os.makedirs(EXCEL_DIR, exist_ok=True)
-USERS_FILE = 'users.json'
-BUDGET_FILE = 'budgets.json'
-
-# Load menu
-with open('structured_menu.json', 'r') as f:
-    full_menu = json.load(f, object_pairs_hook=OrderedDict)
+    return session_user(user_id, session)
+
+def session_user(user_id, session):
+    # The session names the member; the roster index confirms they are still on that team
+    identity = config.identity().resolve(session.get("team", ""), session.get("member_name", ""))
+    if identity is None or user_id not in ("admin", identity.member):
+        return None
+    return User(user_id, identity.team)
+
+# Menu, rosters and budgets (see config_store.py) and the background export runner
+# (see jobs.py) belong to the app that create_app() built
+config = LocalProxy(lambda: current_app.extensions["ksu_config"])
+job_runner = LocalProxy(lambda: current_app.extensions["ksu_jobs"])
+
+def create_app(test_config=None):
+    """Build the Flask app. Nothing here reads the JSON files or touches the database;
+    the menu and rosters load on first use and the schema is managed by `flask upgrade-db`."""
+    app = Flask(__name__)
+    app.secret_key = 'your-secret-key'
+
+    # Pool sizing and pre-ping come from the environment (see db_config.py)
+    app.config['SQLALCHEMY_DATABASE_URI'] = database_url()
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['CONFIG_DIR'] = os.environ.get('KSU_CONFIG_DIR', '.')
+    # 'file' reads the roster from users.json, 'db' from the roster_member table
+    app.config['ROSTER_SOURCE'] = os.environ.get('KSU_ROSTER_SOURCE', 'file')
+    if test_config:
+        app.config.update(test_config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+    login_manager.init_app(app)
+
+    # Opt-in request timing (KSU_METRICS=1) and single-request profiling (KSU_PROFILE=1)
+    init_instrumentation(app)
+
+    # Menu, rosters and budgets: parsed on first use, re-read only when the file changes
+    roster = RosterTable() if app.config['ROSTER_SOURCE'] == 'db' else None
+    store = ConfigStore(app.config['CONFIG_DIR'], roster=roster)
+    app.extensions["ksu_config"] = store
+
+    # Background exports/reports on a small thread pool, started on the first job
+    init_jobs(app, store)
+
+    # Closed seasons moved out of Order into Parquet files (see archive.py)
+    init_archive(app)
+
+    app.register_blueprint(bp)
+    return app
 
 # === Helper Functions ===
 
 def load_users():
-    with open(USERS_FILE, 'r') as f:
-        return json.load(f, object_pairs_hook=OrderedDict)
-
-def build_member_to_team(users):
-    mtt = {}
-    for team, members in users.items():
-        for m in members:
-            m = m.strip()
-            if m:
-                mtt[m] = team
-    return mtt
-
-users = load_users()
-member_to_team = build_member_to_team(users)
-
-def calculate_total_spent_for_team(team_name):
-    total_spent = 0.0
-
-    # Load menu for price lookup
-    with open("structured_menu.json", "r") as f:
-        menu = json.load(f)
-
-    price_lookup = {
-        f"{item}|||{opt['name']}": opt["price"]
-        for group in menu.values()
-        for item, options in group.items()
-        for opt in options
-    }
-
-    users = load_users()
-    member_to_team = build_member_to_team(users)
-
-    for filename in os.listdir(EXCEL_DIR):
-        if not filename.endswith(".xlsx"):
-            continue
-
-        filepath = os.path.join(EXCEL_DIR, filename)
-        wb = load_workbook(filepath, data_only=True)
-
-        if "Yearly Orders" not in wb.sheetnames:
-            continue
+    return config.users()
 
-        sheet = wb["Yearly Orders"]
-
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            try:
-                _, _, member_name, item_name, option_name, qty = row
-                if member_to_team.get(member_name, "") == team_name:
-                    key = f"{item_name}|||{option_name}"
-                    price = price_lookup.get(key, 0.0)
-                    total_spent += float(qty) * price
-            except:
-                continue
-
-    return total_spent
+def calculate_total_spent_for_team(team_name, period=None):
+    # Single indexed lookup on the team_spend ledger kept up to date by save_user_order,
+    # which is keyed by the roster's spelling of the team
+    if period is None:
+        period = budget_period(datetime.now().date())
+    return get_team_spent(config.identity().team(team_name) or team_name, period)
 
 def load_budgets():
-    if not os.path.exists(BUDGET_FILE):
-        return {}
-    with open(BUDGET_FILE, 'r') as f:
-        return json.load(f)
+    return config.budgets()
 
 def save_budgets(budgets):
-    with open(BUDGET_FILE, 'w') as f:
-        json.dump(budgets, f, indent=2)
+    config.save_budgets(budgets)
 
-def get_week_range():
-    today = datetime.now()
-    start = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end = start + timedelta(days=6)
-    return start, end
+def render_report(page):
+    # ✅ Report pages hold nothing per-user, so the rendered page is shared until
+    # an order lands or something in the page's key (menu, budget, roster) changes
+    def render():
+        results = {name: db.session.execute(stmt).all() for name, stmt in page.queries.items()}
+        return render_template(page.template, **page.shape(**results))
 
-# === Database save orders===
+    return fragments.get_or_render(page.key + (order_data_version(),), render)
 
-def save_user_order(member_name, order_datetime, items):
-    team_name = session.get("team", "Unknown Team")
+# === Database save orders===
 
-    for item in items:
-        order = Order(
-            team=team_name,
-            member=member_name,
-            date=order_datetime.date(),
-            time=order_datetime.time(),
-            item_name=item["name"],
-            option=item.get("option", ""),
-            quantity=item["quantity"],
-            price=item["price"]  # ✅ Ensure price is included in each item
-        )
-        db.session.add(order)
+def save_user_order(member_name, order_datetime, items, budget=None):
+    """Store the order, its ledger spend and weekly rollup in one transaction.
 
+    With a `budget`, the team's spend is reserved first and BudgetExceeded is
+    raised (nothing stored) if the order doesn't fit.
+    """
+    team_name = session.get("team", "Unknown Team")
+    order_date = order_datetime.date()
+    order_time = order_datetime.time()
+
+    rows = [{
+        "team": team_name,
+        "member": member_name,
+        "date": order_date,
+        "time": order_time,
+        "item_name": item["name"],
+        "option": item.get("option", ""),
+        "quantity": item["quantity"],
+        "price": item["price"],  # ✅ Price snapshot taken from the catalog, never the client
+        "item_id": item.get("item_id"),
+        "option_id": item.get("option_id"),
+        "week_id": week_index(order_date),
+        "menu_version": item.get("menu_version")
+    } for item in items]
+
+    # ✅ Budget check first: it locks only this team's ledger row until the commit
+    if budget is not None:
+        try:
+            reserve_team_spend(team_name, order_date, items, budget)
+        except BudgetExceeded:
+            db.session.rollback()
+            raise
+    else:
+        record_order_spend(team_name, order_date, items)
+
+    # ✅ One batched INSERT for every line, then the weekly rollup upserts,
+    # all in the same short transaction; the data version goes first so ids
+    # are handed out in commit order (see fragment_cache.py)
+    bump_order_data_version()
+    db.session.execute(insert(Order), rows)
+    record_order_rollup(team_name, member_name, order_date, items)
     db.session.commit()
 
-@app.route('/')
+@bp.route('/')
 def home():
-    return redirect(url_for('submit_order'))
+    return redirect(url_for('.submit_order'))
 
-@app.route('/login', methods=['GET', 'POST'])
+@bp.route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         raw_team = request.form.get('team_name', '').strip()
         raw_name = request.form.get('member_name', '').strip()
 
-        team_input = raw_team.lower()
-        member_input = raw_name.lower()
-
-        users = load_users()
-        users_normalized = {
-            team.lower(): [m.strip().lower() for m in members]
-            for team, members in users.items()
-        }
+        # ✅ One case-insensitive lookup; the session gets the names as the roster spells them
+        identities = config.identity()
+        identity = identities.resolve(raw_team, raw_name)
 
-        if team_input not in users_normalized:
-            return f"Team '{raw_team}' not found.", 403
-
-        if member_input not in users_normalized[team_input]:
+        if identity is None:
+            if identities.team(raw_team) is None:
+                return f"Team '{raw_team}' not found.", 403
             return f"User '{raw_name}' not found on team '{raw_team}'.", 403
 
+        team_name, member_name = identity
+
         # === Scott Trausch is full admin ===
-        if raw_team == "KSU Football" and raw_name == "Scott Trausch":
-            login_user(User("admin", "KSU Football"))
-            session['team'] = "KSU Football"
-            session['member_name'] = "Scott Trausch"
+        if identity == ADMIN:
+            login_user(User("admin", team_name))
+            session['team'] = team_name
+            session['member_name'] = member_name
             session['admin_as_football'] = False  # full admin
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('.admin_dashboard'))
 
         # === Other Football users get limited dashboard (no edit buttons) ===
-        if raw_team == "KSU Football":
-            login_user(User(raw_name, raw_team))
-            session['team'] = "KSU Football"
-            session['member_name'] = raw_name
+        if team_name == ADMIN.team:
+            login_user(User(member_name, team_name))
+            session['team'] = team_name
+            session['member_name'] = member_name
             session['admin_as_football'] = True  # limited admin
-            return redirect(url_for('admin_dashboard'))
+            return redirect(url_for('.admin_dashboard'))
 
         # === All other teams ===
-        login_user(User(raw_name, raw_team))
-        session['team'] = raw_team
-        session['member_name'] = raw_name
+        login_user(User(member_name, team_name))
+        session['team'] = team_name
+        session['member_name'] = member_name
         session['admin_as_football'] = False
-        return redirect(url_for('submit_order'))
+        return redirect(url_for('.submit_order'))
 
     return render_template('login.html')
 
-@app.route('/logout')
+@bp.route('/logout')
 @login_required
 def logout():
     logout_user()
     session.clear()
-    return redirect(url_for('login'))
+    return redirect(url_for('.login'))
 
-@app.route('/order', methods=['GET'])
+@bp.route('/order', methods=['GET'])
 @login_required
 def submit_order():
     # Allow admin to access the order page if they are acting as KSU Football
     if current_user.id == 'admin' and not session.get('admin_as_football'):
-        return redirect(url_for('admin_dashboard'))
-
-    if request.args.get("new") == "1":
-        session.pop("last_order_form", None)
-
-    form_data = session.get('last_order_form', {})
+        return redirect(url_for('.admin_dashboard'))
 
     # ✅ Get team name from session
     team_name = session.get("team", "unknown_team")
+    member_name = session.get("member_name")
+
+    if request.args.get("new") == "1":
+        clear_cart(team_name, member_name)
+
+    # ✅ Quantities already in this member's server-side cart
+    form_data = cart_form_data(cart_lines(team_name, member_name))
 
     # ✅ Load full team budget
     budgets = load_budgets()
     team_budget = budgets.get(team_name, 100.00)  # fallback if missing
 
-    # ✅ Calculate total spent from submitted orders (Excel-based)
+    # ✅ Total spent this budget period, from the team spend ledger
     total_spent = calculate_total_spent_for_team(team_name)
     remaining_budget = team_budget - total_spent
 
     # ✅ Week range string
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-    week_range_str = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
+    week_range_str = current_week().label
 
-    # ✅ Load menu structure
-    with open('structured_menu.json', 'r') as f:
-        grouped_menu = json.load(f, object_pairs_hook=OrderedDict)
+    # ✅ Compiled menu catalog (rebuilt only when structured_menu.json changes); its
+    # rendered table is cached per menu version and the cart quantities are filled in client-side
+    catalog = get_catalog(config)
+    menu_table = fragments.get_or_render(
+        ("order_menu", catalog.version),
+        lambda: render_template("order_menu.html", catalog=catalog))
 
     return render_template("order.html",
                            current_user=current_user,
                            session=session,
-                           grouped_menu=grouped_menu,
+                           menu_table=menu_table,
                            user_budget=team_budget,
                            remaining_budget=remaining_budget,
                            week_range=week_range_str,
                            form_data=form_data)
 
-@app.route('/add_to_order', methods=['POST'])
+@bp.route('/add_to_order', methods=['POST'])
 @login_required
 def add_to_order():
-    form_data = request.form.to_dict()
-
-    print("🧪 Incoming form_data:", form_data)  # ✅ Move it here
-
-    # Only save fields with positive quantity
-    cleaned_form = {}
-
-    for key in form_data:
-        if key.startswith("qty_") and form_data[key].isdigit() and int(form_data[key]) > 0:
-            cleaned_form[key] = form_data[key]
-
-        elif key.startswith("meta_"):
-            suffix = key[5:]
-            qty_key = "qty_" + suffix
-            if qty_key in form_data and form_data[qty_key].isdigit() and int(form_data[qty_key]) > 0:
-                cleaned_form[key] = form_data[key]
+    form_data = request.form
 
-    session['last_order_form'] = cleaned_form
+    # Only keep lines with a positive quantity; the cart replaces its previous contents
+    catalog = get_catalog(config)
+    lines = parse_order_form(form_data, catalog)
+    set_lines(session.get("team", "unknown_team"), session.get("member_name"), lines, catalog)
 
     if form_data.get("action") == "review":
-        return redirect(url_for('review_order'))
+        return redirect(url_for('.review_order'))
     else:
-        return redirect(url_for('submit_order'))
+        return redirect(url_for('.submit_order'))
 
-@app.route('/order/edit', methods=['POST'])
+@bp.route('/order/edit', methods=['POST'])
 @login_required
 def order_form_edit():
     if current_user.id == 'admin' and not session.get("admin_as_football"):
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('.admin_dashboard'))
 
-    form_data = request.form
-    selected_items = []
-
-    for key in form_data:
-        if key.startswith("meta_"):
-            qty_key = "qty_" + key[5:]
-            try:
-                quantity = int(form_data.get(qty_key, 0))
-                if quantity > 0:
-                    item_name, option_name, price = form_data[key].split("|||")
-                    selected_items.append({
-                        "name": item_name,
-                        "option": option_name,
-                        "price": float(price),
-                        "quantity": quantity,
-                        "meta_key": key,
-                        "qty_key": qty_key
-                    })
-            except Exception as e:
-                print(f"⚠️ Error parsing {key}: {e}")
-                continue
+    lines = cart_lines(session.get("team", "unknown_team"), session.get("member_name"))
+    items, _ = priced_items(lines, get_catalog(config))
+
+    selected_items = [dict(item, qty_key=qty_key(item["option_id"])) for item in items]
 
     return render_template("order_edit.html", selected_items=selected_items)
 
-@app.route('/order/review', methods=['GET', 'POST'])
-@login_required
-def review_order():
+def render_review(error=None):
     budgets = load_budgets()
     team_name = session.get("team")
     team_budget = budgets.get(team_name, 100.00)
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-    week_range_str = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
-
-    form_data = session.get('last_order_form', {})
-    session['last_order_form'] = form_data  # Save for "Return to Order Page"
-
-    items = []
-    total = 0.0
+    week_range_str = current_week().label
 
-    # Iterate over all submitted keys
-    for key in form_data:
-        if key.startswith("meta_"):
-            suffix = key[5:]  # e.g., Gatorade_Shake_Chocolate
-            qty_key = "qty_" + suffix
-            qty_str = form_data.get(qty_key, "0").strip()
+    # Cart lines priced from the current menu
+    lines = cart_lines(team_name, session.get("member_name"))
+    items, total = priced_items(lines, get_catalog(config))
 
-            if qty_str.isdigit() and int(qty_str) > 0:
-                quantity = int(qty_str)
-                try:
-                    item_name, option_name, price = form_data[key].split("|||")
-                    price = float(price)
-                    subtotal = price * quantity
-                    total += subtotal
-                    items.append({
-                        "name": item_name,
-                        "option": option_name,
-                        "price": price,
-                        "quantity": quantity,
-                        "subtotal": subtotal
-                    })
-                except Exception as e:
-                    print(f"⚠️ Error parsing key {key}: {e}")
-                    continue
+    # ✅ What the team has left once this order is counted
+    remaining_budget = team_budget - calculate_total_spent_for_team(team_name) - total
+    if error is None and items and remaining_budget < 0:
+        error = f"This order is ${-remaining_budget:.2f} over your team's remaining budget."
 
     return render_template("order_review.html",
                            items=items,
                            total=total,
                            user_budget=team_budget,
-                           remaining_budget=team_budget - total,
-                           week_range=week_range_str,
-                           form_data=form_data)
+                           remaining_budget=remaining_budget,
+                           error=error,
+                           week_range=week_range_str)
 
-@app.route('/order/submit', methods=['POST'])
+@bp.route('/order/review', methods=['GET', 'POST'])
 @login_required
-def finalize_order():
-    form_data = session.get('last_order_form', {})
-
-    items = []
-    total = 0.0
-
-    for key in form_data:
-        if key.startswith("meta_"):
-            suffix = key[5:]
-            qty_key = "qty_" + suffix
-            qty_str = form_data.get(qty_key, "0").strip()
-            if qty_str.isdigit() and int(qty_str) > 0:
-                item_name, option_name, price = form_data[key].split("|||")
-                price = float(price)
-                quantity = int(qty_str)
-                total += price * quantity
-                items.append({
-                    "name": item_name,
-                    "option": option_name,
-                    "price": price,
-                    "quantity": quantity
-                })
-
-    # ✅ Save order if any items exist
-    if items:
-        save_user_order(session.get("member_name"), datetime.now(), items)
+def review_order():
+    return render_review()
 
-    # ✅ Load team budget and recalculate total spent from Excel
+@bp.route('/order/submit', methods=['POST'])
+@login_required
+def finalize_order():
     team_name = session.get("team", "unknown_team")
-    budgets = load_budgets()
-    team_budget = budgets.get(team_name, 100.00)
-    total_spent = calculate_total_spent_for_team(team_name)
-    remaining_budget = team_budget - total_spent  # Optional: for logging/debugging if needed
+    member_name = session.get("member_name")
 
-    # ✅ Clear form after submission
-    session.pop('last_order_form', None)
+    lines = cart_lines(team_name, member_name)
+    items, total = priced_items(lines, get_catalog(config))
 
-    return redirect(url_for('submit_order'))
+    # ✅ Save order if any items exist; the budget is enforced inside the same transaction
+    if items:
+        team_budget = load_budgets().get(team_name, 100.00)
+        try:
+            save_user_order(member_name, datetime.now(), items, budget=team_budget)
+        except BudgetExceeded as e:
+            # Cart is kept so the member can trim it and try again
+            return render_review(error=str(e)), 409
 
-from sqlalchemy import and_
+    # ✅ Clear cart after submission
+    clear_cart(team_name, member_name)
 
-@app.route('/admin/produce_hyvee')
+    return redirect(url_for('.submit_order'))
+
+@bp.route('/admin/produce_hyvee')
 @login_required
 def admin_produce_hyvee():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-
-    # Load Produce and Hyvee items from structured_menu
-    with open("structured_menu.json", "r") as f:
-        menu = json.load(f)
-
-    valid_items = set(menu.get("Produce", {}).keys()) | set(menu.get("Hyvee", {}).keys())
-
-    # Query the DB for this week's orders
-    results = Order.query.filter(
-        and_(
-            Order.date >= start_of_week.date(),
-            Order.date <= end_of_week.date(),
-            Order.item_name.in_(valid_items)
-        )
-    ).order_by(Order.date.desc()).all()
+    # This week's orders for the Produce and Hyvee items from structured_menu
+    page = produce_hyvee_page(current_week(), config.produce_hyvee_items())
+    return render_report(page)
 
-    # Format results
-    filtered_orders = [
-        (order.date.strftime("%-m/%-d/%y"), order.team, order.item_name, order.quantity)
-        for order in results
-    ]
-
-    week_range = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
-    return render_template("admin_produce_hyvee.html", orders=filtered_orders, week_range=week_range)
-
-@app.route('/admin')
+@bp.route('/admin')
 @login_required
 def admin_dashboard():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
@@ -430,14 +362,9 @@ def admin_dashboard():
     users = load_users()
     all_teams = list(users.keys())
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-    week_range_str = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
+    return render_template('admin_dashboard.html', teams=all_teams, week_range=current_week().label)
 
-    return render_template('admin_dashboard.html', teams=all_teams, week_range=week_range_str)
-
-@app.route('/admin/football_order')
+@bp.route('/admin/football_order')
 @login_required
 def admin_football_order():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
@@ -445,264 +372,231 @@ def admin_football_order():
 
     # Only admin can simulate football ordering (do NOT overwrite session info)
     session['admin_as_football'] = True
-    return redirect(url_for('submit_order'))
+    return redirect(url_for('.submit_order'))
 
-@app.route('/admin/team/<team_name>')
+@bp.route('/admin/team/<team_name>')
 @login_required
 def view_team_orders(team_name):
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-    week_range_str = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
-
-    results = Order.query.filter(
-        Order.team == team_name,
-        Order.date >= start_of_week.date(),
-        Order.date <= end_of_week.date()
-    ).order_by(Order.date, Order.time).all()
-
-    # Weekly orders grouped by member
-    orders_by_member = {}
-    all_totals = {}
-
-    for o in results:
-        item = f"{o.item_name} - {o.option}".strip(" -")
-        subtotal = o.quantity * o.price
-
-        if o.member not in orders_by_member:
-            orders_by_member[o.member] = {"orders": [], "total": 0.0}
-
-        orders_by_member[o.member]["orders"].append({
-            "date": o.date.strftime("%Y-%m-%d"),
-            "time": o.time.strftime("%I:%M %p"),
-            "item": item,
-            "quantity": o.quantity,
-            "price": f"${o.price:.2f}",
-            "subtotal": f"${subtotal:.2f}"
-        })
-
-        orders_by_member[o.member]["total"] += subtotal
-
-        if item not in all_totals:
-            all_totals[item] = {"qty": 0, "total_cost": 0.0}
+    team_name = config.identity().team(team_name) or team_name
+    page = team_orders_page(team_name, current_week(), load_budgets().get(team_name, 100.00))
+    return render_report(page)
+
+def export_args(args=None):
+    """Date range, team and format for an export; defaults to this week, all teams, .xlsx."""
+    args = request.args if args is None else args
+    week = current_week()
+    try:
+        start = date.fromisoformat(args["start"]) if args.get("start") else week.start
+        end = date.fromisoformat(args["end"]) if args.get("end") else week.end
+    except ValueError:
+        return None
+    team = args.get("team", "").strip() or None
+    fmt = "csv" if args.get("format") == "csv" else "xlsx"
+    return start, end, team, fmt
+
+def export_filename(prefix, start, end, team, fmt):
+    name = f"{prefix}_{start.strftime('%Y%m%d')}"
+    if end - start > timedelta(days=6):
+        name += f"_{end.strftime('%Y%m%d')}"
+    if team:
+        name += "_" + team.replace(" ", "_")
+    return f"{name}.{fmt}"
+
+def export_response(export, filename, fmt):
+    title, header, rows = export
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+
+    if fmt == "csv":
+        return Response(stream_with_context(iter_csv(header, rows)),
+                        mimetype=CSV_MIMETYPE, headers=headers)
+
+    path = build_xlsx_file(title, header, rows)
+    headers["Content-Length"] = str(os.path.getsize(path))
+    return Response(FileThenRemove(path), mimetype=XLSX_MIMETYPE, headers=headers)
+
+@bp.route('/admin/produce_hyvee/export')
+@login_required
+def export_produce_hyvee_excel():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
 
-        all_totals[item]["qty"] += o.quantity
-        all_totals[item]["total_cost"] += subtotal
+    args = export_args()
+    if args is None:
+        return "Invalid date range", 400
+    start, end, team, fmt = args
 
-    total_team_cost = sum([v["total_cost"] for v in all_totals.values()])
-    team_budget = load_budgets().get(team_name, 100.00)
-    remaining_budget = team_budget - total_team_cost
+    export = produce_hyvee_export(start, end, config.produce_hyvee_items(), team)
+    filename = export_filename("Produce_Hyvee_Orders", start, end, team, fmt)
+    return export_response(export, filename, fmt)
 
-    return render_template("team_orders.html",
-                           team_name=team_name,
-                           week_range=week_range_str,
-                           weekly_orders_by_member=orders_by_member,
-                           total_orders=all_totals,
-                           total_cost=total_team_cost,
-                           user_budget=team_budget,
-                           remaining_budget=remaining_budget)
+@bp.route('/admin/weekly_summary/export')
+@login_required
+def export_weekly_summary_excel():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
 
-from openpyxl import Workbook
-from io import BytesIO
-from flask import send_file
+    args = export_args()
+    if args is None:
+        return "Invalid date range", 400
+    start, end, team, fmt = args
 
-from openpyxl import Workbook
-from io import BytesIO
-from flask import send_file
+    export = weekly_summary_export(start, end, team)
+    filename = export_filename("Full_Weekly_Orders", start, end, team, fmt)
+    return export_response(export, filename, fmt)
 
-@app.route('/admin/produce_hyvee/export')
+@bp.route('/admin/jobs', methods=['GET', 'POST'])
 @login_required
-def export_produce_hyvee_excel():
+def admin_jobs():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-
-    with open("structured_menu.json", "r") as f:
-        menu = json.load(f)
-
-    valid_items = set(menu.get("Produce", {}).keys()) | set(menu.get("Hyvee", {}).keys())
-
-    results = Order.query.filter(
-        and_(
-            Order.date >= start_of_week.date(),
-            Order.date <= end_of_week.date(),
-            Order.item_name.in_(valid_items)
-        )
-    ).order_by(Order.date.asc(), Order.team.asc()).all()
-
-    # Create workbook
-    wb_out = Workbook()
-    ws_out = wb_out.active
-    ws_out.title = "Produce & Hyvee"
-    ws_out.append(["Date", "Team", "Item", "Quantity"])
-
-    for order in results:
-        ws_out.append([
-            order.date.strftime("%Y-%m-%d"),
-            order.team,
-            order.item_name,
-            order.quantity
-        ])
-
-    output = BytesIO()
-    wb_out.save(output)
-    output.seek(0)
-
-    filename = f"Produce_Hyvee_Orders_{start_of_week.strftime('%Y%m%d')}.xlsx"
-    return send_file(output,
-                     download_name=filename,
-                     as_attachment=True,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
-from io import BytesIO
-
-@app.route('/admin/weekly_summary/export')
+    if request.method == 'POST':
+        kind = request.form.get("kind")
+        args = export_args(request.form)
+        if kind not in JOB_KINDS or args is None:
+            return "Invalid export request", 400
+        start, end, team, fmt = args
+
+        # ✅ Clear out expired artifacts before adding another
+        job_runner.sweep()
+        params = {"start": start.isoformat(), "end": end.isoformat(), "team": team, "format": fmt}
+        if kind == "weekly_totals":
+            # The grid always covers every year on record
+            params.update(start=None, end=None, team=None)
+        job_runner.enqueue(kind, params, owner=session.get("member_name"))
+        return redirect(url_for('.admin_jobs'))
+
+    recent = Job.query.order_by(Job.created_at.desc()).limit(50).all()
+    return render_template("admin_jobs.html",
+                           jobs=recent,
+                           week=current_week(),
+                           teams=list(load_users().keys()))
+
+@bp.route('/admin/jobs/<job_id>.json')
 @login_required
-def export_weekly_summary_excel():
+def admin_job_status(job_id):
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
-        return "Access Denied", 403
+        return jsonify({"error": "Access Denied"}), 403
+
+    job = db.session.get(Job, job_id)
+    if job is None:
+        return jsonify({"error": "No such job"}), 404
+    status = job_status(job)
+    if job.status == DONE:
+        status["download"] = url_for('.admin_job_download', job_id=job.id)
+    return jsonify(status)
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-
-    results = Order.query.filter(
-        and_(
-            Order.date >= start_of_week.date(),
-            Order.date <= end_of_week.date()
-        )
-    ).order_by(Order.date.asc(), Order.time.asc()).all()
-
-    wb_out = Workbook()
-    ws_out = wb_out.active
-    ws_out.title = "Weekly Summary"
-    ws_out.append(["Date", "Team", "Item", "Quantity"])
-
-    for order in results:
-        item_full = f"{order.item_name} - {order.option}".strip(" -")
-        ws_out.append([
-            order.date.strftime("%Y-%m-%d"),
-            order.team,
-            item_full,
-            order.quantity
-        ])
-
-    output = BytesIO()
-    wb_out.save(output)
-    output.seek(0)
-
-    filename = f"Full_Weekly_Orders_{start_of_week.strftime('%Y%m%d')}.xlsx"
-    return send_file(output,
-                     download_name=filename,
-                     as_attachment=True,
-                     mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
-
-@app.route('/admin/weekly_summary')
+@bp.route('/admin/jobs/<job_id>/download')
 @login_required
-def admin_weekly_summary():
+def admin_job_download(job_id):
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    today = datetime.now()
-    start_of_week = today - timedelta(days=today.weekday() + 1) if today.weekday() != 6 else today
-    end_of_week = start_of_week + timedelta(days=6)
-
-    week_range_str = f"{start_of_week.strftime('%-m/%-d/%y')} - {end_of_week.strftime('%-m/%-d/%y')}"
+    job = db.session.get(Job, job_id)
+    if job is None or job.status != DONE or not os.path.exists(job_runner.artifact_path(job)):
+        return "Export not available", 404
+    return send_file(job_runner.artifact_path(job), mimetype=job.mimetype,
+                     as_attachment=True, download_name=job.filename)
 
-    results = Order.query.filter(
-        and_(
-            Order.date >= start_of_week.date(),
-            Order.date <= end_of_week.date()
-        )
-    ).order_by(Order.date.desc(), Order.time.desc()).all()
-
-    all_orders = []
-    for o in results:
-        item_full = f"{o.item_name} - {o.option}".strip(" -")
-        all_orders.append({
-            "date": o.date.strftime("%-m/%-d/%y"),
-            "team": o.team,
-            "item": item_full,
-            "quantity": o.quantity
-        })
+@bp.route('/admin/weekly_summary')
+@login_required
+def admin_weekly_summary():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
 
-    return render_template("weekly_summary.html", week_range=week_range_str, orders=all_orders)
+    return render_report(weekly_summary_page(current_week()))
 
-@app.route('/admin/weekly_totals')
+@bp.route('/admin/weekly_totals')
 @login_required
 def weekly_totals():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    def get_week_number(date):
-        week1_start = datetime(2025, 1, 1)
-        week1_start -= timedelta(days=week1_start.weekday() + 1) if week1_start.weekday() != 6 else timedelta(0)
-        delta = date - week1_start
-        return (delta.days // 7) + 1
-
-    results = Order.query.all()
-
-    totals_by_week = {week: {} for week in range(1, 53)}
-    yearly_totals_by_week = {2025: {w: {} for w in range(1, 53)}, 2024: {w: {} for w in range(1, 53)}}
-
-    for o in results:
-        year = o.date.year
-        week_num = get_week_number(o.date)
-        subtotal = o.price * o.quantity
-
-        if week_num < 1 or week_num > 52:
-            continue
+    # ✅ The whole grid is cached until an order lands or the roster changes
+    return render_report(weekly_totals_page(datetime.now().year, load_users()))
+
+def order_page_args():
+    args = request.args
+    return {
+        "team": args.get("team", "").strip() or None,
+        "member": args.get("member", "").strip() or None,
+        "item": args.get("item", "").strip() or None,
+        "year": args.get("year", type=int),
+        "week": args.get("week", type=int),
+        "after": args.get("after") or None,
+        "limit": args.get("limit", ORDER_PAGE_SIZE, type=int),
+    }
 
-        if year not in yearly_totals_by_week:
-            yearly_totals_by_week[year] = {w: {} for w in range(1, 53)}
+@bp.route('/admin/all_orders')
+@login_required
+def all_orders():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
 
-        yearly_totals_by_week[year][week_num][o.team] = yearly_totals_by_week[year][week_num].get(o.team, 0.0) + subtotal
+    page_args = order_page_args()
+    rows, next_cursor = order_page(**page_args)
 
-        if year == 2025:
-            totals_by_week[week_num][o.team] = totals_by_week[week_num].get(o.team, 0.0) + subtotal
+    return render_template("all_orders.html",
+                           orders=[format_order_row(r) for r in rows],
+                           next_cursor=next_cursor,
+                           filters=page_args,
+                           teams=list(load_users().keys()))
 
-    users = load_users()
+@bp.route('/admin/all_orders.json')
+@login_required
+def all_orders_json():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return jsonify({"error": "Access Denied"}), 403
 
-    return render_template("weekly_totals.html",
-                           totals_by_week=totals_by_week,
-                           yearly_totals_by_week=yearly_totals_by_week,
-                           users=users,
-                           datetime=datetime,
-                           timedelta=timedelta)
+    rows, next_cursor = order_page(**order_page_args())
+    return jsonify({
+        "orders": [format_order_row(r) for r in rows],
+        "next": next_cursor
+    })
 
-@app.route('/admin/all_orders')
+@bp.route('/admin/analytics')
 @login_required
-def all_orders():
+def admin_analytics():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    results = Order.query.order_by(Order.date.desc(), Order.time.desc()).all()
-
-    full_orders = []
-    for o in results:
-        order_date = o.date
-        week_num = (order_date - datetime(2025, 1, 1)).days // 7 + 1
-
-        full_orders.append({
-            "date": o.date.strftime("%Y-%m-%d"),
-            "time": o.time.strftime("%I:%M %p"),
-            "week": week_num,
-            "year": o.date.year,
-            "team": o.team,
-            "member": o.member,
-            "item": f"{o.item_name} - {o.option}".strip(" -"),
-            "quantity": o.quantity
-        })
-
-    return render_template("all_orders.html", orders=full_orders)
+    # ✅ Every order line in one cached columnar frame; only orders newer than the cache are fetched
+    frame = order_frame()
+    this_year = date.today().year
+    year = request.args.get("year", this_year, type=int)
+    team = request.args.get("team", "").strip() or None
+    teams = list(load_users().keys())
+
+    grid = season_team_weeks(frame, year)
+    return render_template("admin_analytics.html",
+                           year=year,
+                           years=sorted(set(frame.years()) | {this_year, year}, reverse=True),
+                           team=team,
+                           teams=teams,
+                           weeks=weeks_of_year(year),
+                           grid=grid,
+                           grid_teams=[t for t in teams if t in grid] + sorted(t for t in grid if t not in teams),
+                           top_items=top_items(frame, year, team),
+                           members=member_consumption(frame, year, team))
+
+@bp.route('/admin/burn_rate')
+@login_required
+def admin_burn_rate():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
 
-@app.route('/admin/budgets', methods=['GET', 'POST'])
+    budgets = load_budgets()
+    rows = burn_rates(order_frame(), {team: budgets.get(team, 100.00) for team in load_users()})
+    return render_template("admin_burn_rate.html",
+                           rows=rows,
+                           year=date.today().year,
+                           week_range=current_week().label,
+                           recent_weeks=RECENT_WEEKS)
+
+@bp.route('/admin/budgets', methods=['GET', 'POST'])
 @login_required
 def manage_budgets():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
@@ -725,18 +619,16 @@ def manage_budgets():
                 except ValueError:
                     continue
         save_budgets(updated_budgets)
-        return redirect(url_for('manage_budgets'))
+        return redirect(url_for('.manage_budgets'))
 
     return render_template("manage_budgets.html", team_budgets=updated_budgets)
 
-@app.route('/admin/edit_menu', methods=['GET', 'POST'])
+@bp.route('/admin/edit_menu', methods=['GET', 'POST'])
 @login_required
 def edit_menu():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    menu_path = 'structured_menu.json'
-
     if request.method == 'POST':
         form = request.form
         updated_menu = OrderedDict()
@@ -744,6 +636,10 @@ def edit_menu():
         group_names = [key.split('[')[1].split(']')[0] for key in form.keys() if key.startswith("group_names[")]
         group_names = list(OrderedDict.fromkeys(group_names))
 
+        # Catalog ids posted alongside the names, so renamed items/options keep their ids
+        item_renames = {}
+        option_renames = {}
+
         for group in group_names:
             item_names = form.getlist(f'group_names[{group}][item_names][]')
             group_data = OrderedDict()
@@ -753,38 +649,97 @@ def edit_menu():
                     continue
                 options = form.getlist(f'options[{item_name}][]')
                 prices = form.getlist(f'prices[{item_name}][]')
+                option_ids = form.getlist(f'option_ids[{item_name}][]')
                 if not options or not prices or len(options) != len(prices):
                     continue
+                item_id = form.get(f'item_ids[{item_name}]', '')
+                if item_id.isdigit():
+                    item_renames[int(item_id)] = item_name
                 item_options = []
-                for opt, price_str in zip(options, prices):
+                for opt, price_str, option_id in zip(options, prices, option_ids + [''] * len(options)):
                     opt = opt.strip()
-                    try:
-                        price = float(price_str)
-                        if opt:
-                            item_options.append({ "name": opt, "price": price })
-                    except ValueError:
+                    if not opt:
                         continue
+                    try:
+                        price = menu_price(price_str)
+                    except MenuPatchError as e:
+                        # ✅ Nothing is saved: a NaN or infinite price would break the catalog for every page
+                        flash(f"{item_name} - {opt}: {e}")
+                        return redirect(url_for('.edit_menu'))
+                    item_options.append({ "name": opt, "price": price })
+                    if option_id.isdigit():
+                        option_renames[int(option_id)] = opt
                 if item_options:
                     group_data[item_name] = item_options
             if group_data:
                 updated_menu[group] = group_data
 
-        with open(menu_path, 'w') as f:
-            json.dump(updated_menu, f, indent=2)
-        return redirect(url_for('edit_menu'))
+        base_version = form.get('base_version', '')
+        try:
+            # ✅ Renames are committed only once the snapshot is saved, so a stale page renames nothing
+            if base_version.isdigit() and int(base_version) != config.menu_version():
+                raise MenuConflict(config.menu_version())
+            apply_renames(item_renames, option_renames)
+            config.save_menu(updated_menu, change="saved the menu page", saved_by=session.get('member_name'),
+                             base_version=int(base_version) if base_version.isdigit() else None)
+        except MenuConflict as e:
+            db.session.rollback()
+            return str(e), 409
+        db.session.commit()
+        return redirect(url_for('.edit_menu'))
+
+    return render_template('edit_menu_fixed.html', catalog=get_catalog(config))
+
+@bp.route('/admin/menu.json')
+@login_required
+def menu_json():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return jsonify({"error": "Access Denied"}), 403
+
+    snapshot = config.menu_snapshot()
+    return jsonify({"version": snapshot.version, "menu": snapshot.menu})
 
-    with open(menu_path, 'r') as f:
-        grouped_menu = json.load(f, object_pairs_hook=OrderedDict)
-    return render_template('edit_menu_fixed.html', grouped_menu=grouped_menu)
+@bp.route('/admin/menu/patch', methods=['POST'])
+@login_required
+def patch_menu():
+    """Apply a few option edits: {"base_version": n, "ops": [{"op": "add"|"update"|"remove", ...}]}."""
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return jsonify({"error": "Access Denied"}), 403
+
+    body = request.get_json(silent=True) or {}
+    if not isinstance(body, dict):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    ops = body.get("ops")
+    if not isinstance(ops, list) or not ops:
+        return jsonify({"error": "Expected a non-empty list of ops"}), 400
+    if not all(isinstance(op, dict) for op in ops):
+        return jsonify({"error": "Each op must be a JSON object"}), 400
+
+    catalog = get_catalog(config)
+    base_version = body.get("base_version", catalog.version)
+    if base_version != catalog.version:
+        return jsonify({"error": str(MenuConflict(catalog.version)), "version": catalog.version}), 409
+    try:
+        menu, renames, change = apply_menu_patch(config.menu_snapshot().menu, ops, catalog)
+        # ✅ Renamed options keep their catalog ids; the renames are committed only once
+        # the new version is saved, so a conflicting patch leaves the catalog as it was
+        apply_renames({}, renames)
+        version = config.save_menu(menu, change=change, saved_by=session.get('member_name'),
+                                   base_version=catalog.version)
+    except MenuPatchError as e:
+        return jsonify({"error": str(e)}), 400
+    except MenuConflict as e:
+        db.session.rollback()
+        return jsonify({"error": str(e), "version": e.current}), 409
+    db.session.commit()
+    return jsonify({"version": version, "change": change})
 
-@app.route('/admin/edit_users', methods=['GET', 'POST'])
+@bp.route('/admin/edit_users', methods=['GET', 'POST'])
 @login_required
 def edit_users():
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    users_path = 'users.json'
-
     if request.method == 'POST':
         team_names = request.form.getlist('team_names[]')
         members_list = request.form.getlist('members[]')
@@ -795,68 +750,175 @@ def edit_users():
             members = [m.strip() for m in members_raw.splitlines() if m.strip()]
             updated_users[team.strip()] = members if members else [" "]
 
-        with open(users_path, 'w') as f:
-            json.dump(updated_users, f, indent=2)
-
-        return redirect(url_for('admin_dashboard'))
+        config.save_users(updated_users)
 
-    with open(users_path, 'r') as f:
-        users = json.load(f, object_pairs_hook=OrderedDict)
+        return redirect(url_for('.admin_dashboard'))
 
-    return render_template("edit_users.html", users=users)
+    return render_template("edit_users.html", users=config.users())
 
-@app.route('/admin/user/<user_name>')
+@bp.route('/admin/user/<user_name>')
 @login_required
 def view_user_file(user_name):
     if not (current_user.id == 'admin' or session.get('admin_as_football')):
         return "Access Denied", 403
 
-    current_week = datetime.now().isocalendar()[1]
-
-    weekly_orders = []
-    total_orders = []
-
-    results = Order.query.filter(Order.member == user_name).all()
+    this_week = current_week()
 
-    for o in results:
-        order_week = o.date.isocalendar()[1]
-        item_name = f"{o.item_name} - {o.option}".strip(" -")
-
-        if order_week == current_week:
-            weekly_orders.append({
-                "date": o.date.strftime("%Y-%m-%d"),
-                "item": item_name,
-                "quantity": o.quantity
-            })
-
-        # accumulate total per item
-        found = False
-        for row in total_orders:
-            if row["item"] == item_name:
-                row["quantity"] += o.quantity
-                found = True
-                break
-        if not found:
-            total_orders.append({"item": item_name, "quantity": o.quantity})
+    # ✅ Totals cover this calendar year unless a range is picked; ?all=1 means everything
+    today = date.today()
+    if request.args.get("all") == "1":
+        start = end = None
+    else:
+        try:
+            start = date.fromisoformat(request.args["start"]) if request.args.get("start") else date(today.year, 1, 1)
+            end = date.fromisoformat(request.args["end"]) if request.args.get("end") else today
+        except ValueError:
+            return "Invalid date range", 400
+
+    # This Sunday-start week's lines (the old ISO week number matched the same week of past years too)
+    weekly_orders = [{
+        "date": o.date.strftime("%Y-%m-%d"),
+        "item": item_label(o.item_name, o.option),
+        "quantity": o.quantity
+    } for o in member_week_lines(user_name, this_week)]
+
+    # Per-item totals for the range, one grouped query on the weekly rollup
+    total_orders = member_item_totals(user_name, start, end)
 
     return render_template("user_orders.html",
                            user_name=user_name,
+                           team_name=config.identity().team_of(user_name),
+                           week_range=this_week.label,
                            weekly_orders=weekly_orders,
-                           total_orders=total_orders)
+                           total_orders=total_orders,
+                           total_spend=sum(entry["spend"] for entry in total_orders),
+                           start=start,
+                           end=end,
+                           this_year=date(today.year, 1, 1))
+
+@bp.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if not (current_user.id == 'admin' or session.get('admin_as_football')):
+        return "Access Denied", 403
+
+    return render_template("admin_metrics.html",
+                           enabled=current_app.config.get("METRICS_ENABLED"),
+                           profiling=current_app.config.get("PROFILING_ENABLED"),
+                           endpoints=endpoint_stats.summary(),
+                           fragment_cache=fragments.summary(),
+                           pool=pool_stats(db.engine),
+                           worker_pid=os.getpid())
 
-@app.route('/admin/init_db')
+@bp.route('/admin/init_db')
+@login_required
 def init_db():
-    from models import db
-    db.create_all()
-    return "✅ Database tables created."
+    if current_user.id != 'admin':
+        return "Access Denied", 403
 
-with app.app_context():
-    db.create_all()
+    changes = upgrade_schema()
+    return "✅ Database schema is up to date." + (f" Added: {', '.join(changes)}" if changes else "")
+
+@bp.cli.command('upgrade-db')
+def upgrade_db_command():
+    """Create missing tables and add missing indexes to existing ones."""
+    changes = upgrade_schema()
+    for change in changes:
+        click.echo(f"Added {change}")
+    if "column order.week_id" in changes:
+        click.echo(f"Filled week_id on {backfill_order_weeks()} orders.")
+    click.echo("✅ Schema is up to date.")
+
+@bp.cli.command('rebuild-ledger')
+def rebuild_ledger_command():
+    """Recompute the team spend ledger from the Order table and the archive."""
+    changes = rebuild_ledger()
+    for (team, period), (before, after) in sorted(changes.items()):
+        click.echo(f"{team} {period}: {before:.2f} -> {after:.2f}")
+    click.echo(f"✅ Ledger rebuilt ({len(changes)} totals corrected).")
+
+@bp.cli.command('sync-catalog')
+def sync_catalog_command():
+    """Assign catalog ids to the current menu and fill them in on older orders."""
+    catalog = get_catalog(config)
+    updated = backfill_order_ids(catalog)
+    click.echo(f"✅ Catalog has {len(catalog.items)} items; {updated} orders linked to catalog ids.")
+
+@bp.cli.command('sweep-carts')
+def sweep_carts_command():
+    """Delete carts nobody has touched within the cart TTL."""
+    count = sweep_expired_carts()
+    click.echo(f"✅ Removed {count} expired carts.")
+
+@bp.cli.command('backfill-weeks')
+def backfill_weeks_command():
+    """Set week_id on orders stored without one."""
+    count = backfill_order_weeks()
+    click.echo(f"✅ Filled week_id on {count} orders.")
+
+@bp.cli.command('sweep-jobs')
+def sweep_jobs_command():
+    """Delete background jobs and artifacts older than the job TTL."""
+    count = job_runner.sweep()
+    click.echo(f"✅ Removed {count} expired jobs.")
+
+@bp.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the weekly team/member/item rollup from the Order table and the archive."""
+    count = rebuild_rollups()
+    click.echo(f"✅ Weekly rollup rebuilt ({count} rows).")
+
+@bp.cli.command('menu-versions')
+@click.option('--limit', default=20, show_default=True, help="How many of the newest versions to list.")
+def menu_versions_command(limit):
+    """List the newest menu versions and what changed in each."""
+    history = config.menu_history
+    current = config.menu_version()
+    for version in reversed(history.versions()[-limit:]):
+        record = history.record(version)
+        marker = "*" if version == current else " "
+        click.echo(f"{marker} {version:>4}  {record['saved_at']}  {record['saved_by'] or '-':<20} {record['change']}")
+
+@bp.cli.command('restore-menu')
+@click.argument('version', type=int)
+def restore_menu_command(version):
+    """Make an earlier menu version live again (recorded as a new version)."""
+    if version not in config.menu_history.versions():
+        raise click.BadParameter(f"No menu version {version}", param_hint="VERSION")
+    menu = config.menu_history.record(version)["menu"]
+    new_version = config.save_menu(menu, change=f"restored version {version}")
+    click.echo(f"✅ Menu version {version} is live again as version {new_version}.")
+
+@bp.cli.command('import-roster')
+def import_roster_command():
+    """Copy users.json into the roster_member table (used when KSU_ROSTER_SOURCE=db)."""
+    count = RosterTable().save(config.users_file.get())
+    click.echo(f"✅ Copied {count} roster entries into the roster table.")
+
+@bp.cli.command('archive-season')
+@click.argument('year', type=int)
+@click.option('--dry-run', is_flag=True, help="Count the orders that would move without moving them.")
+def archive_season_command(year, dry_run):
+    """Move a closed season's orders out of the Order table into a Parquet file."""
+    try:
+        count, spend = archive_season(year, dry_run=dry_run)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="YEAR")
+    if dry_run:
+        click.echo(f"{count} orders (${spend:.2f}) from {year} would be archived.")
+    else:
+        click.echo(f"✅ Archived {count} orders (${spend:.2f}) from {year}.")
+
+@bp.cli.command('archive-status')
+def archive_status_command():
+    """List archived seasons with their order count, spend and file size."""
+    summaries = season_summaries()
+    for season in summaries:
+        click.echo(f"{season['year']}: {season['rows']} orders, ${season['spend']:.2f}, "
+                   f"{season['bytes'] / 1024:.0f} KiB")
+    if not summaries:
+        click.echo("No archived seasons.")
 
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()  # ← this creates the Order table
-    app.run(debug=True)
-
-if __name__ == "__main__":
-    app.run(debug=True)
+    # Local development only; run `flask upgrade-db` first on a new database
+    create_app().run(debug=True)
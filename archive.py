@@ -0,0 +1,312 @@
+"""Closed seasons of orders, moved out of the Order table into Parquet files.
+
+A season is a calendar year, the same as a budget period. `flask archive-season 2024`
+writes every Order row dated in 2024 to <ARCHIVE_DIR>/orders_2024.parquet
+(zstd-compressed), reads the file back to check its row count and spend, and
+only then deletes those rows from Order. The weekly rollup and the team spend
+ledger keep their rows, so weekly totals, user pages and budgets are unchanged.
+
+Readers that reach back past the live table (all orders, exports, the
+analytics frame, the ledger and rollup rebuilds) add archived rows with the
+helpers below. They need pyarrow, but a tree without archive files never
+imports it.
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+from datetime import date
+from functools import lru_cache
+
+from flask import current_app
+from sqlalchemy import select
+
+from fragment_cache import bump_order_data_version
+from models import db, Order
+from weeks import week_by_id, week_index
+
+ARCHIVE_FILE = "orders_{year}.parquet"
+_ARCHIVE_FILE_RE = re.compile(r"^orders_(\d{4})\.parquet$")
+
+# Archived columns, in file order; names match the Order model
+COLUMNS = ("id", "team", "member", "date", "time", "item_name", "option", "quantity", "price",
+           "item_id", "option_id", "week_id", "menu_version")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError("pyarrow is required to read or write the order archive (pip install pyarrow)")
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("id", pa.int64()), ("team", pa.string()), ("member", pa.string()), ("date", pa.date32()),
+        ("time", pa.time64("us")), ("item_name", pa.string()), ("option", pa.string()),
+        ("quantity", pa.int64()), ("price", pa.float64()), ("item_id", pa.int64()),
+        ("option_id", pa.int64()), ("week_id", pa.int64()), ("menu_version", pa.int64()),
+    ])
+
+
+def archive_dir():
+    return os.path.abspath(current_app.config["ARCHIVE_DIR"])
+
+
+def archived_seasons():
+    """{year: path} of every archived season."""
+    directory = archive_dir()
+    try:
+        entries = os.scandir(directory)
+    except FileNotFoundError:
+        return {}
+    with entries:
+        return {
+            int(match.group(1)): entry.path
+            for entry in entries
+            if (match := _ARCHIVE_FILE_RE.match(entry.name))
+        }
+
+
+def archive_version():
+    """Changes whenever a season file is written; part of cache keys over history."""
+    version = []
+    for year, path in sorted(archived_seasons().items()):
+        st = os.stat(path)
+        version.append((year, st.st_mtime_ns, st.st_size))
+    return tuple(version)
+
+
+# === Reading ===
+
+_lock = threading.Lock()
+_tables = {}
+
+
+def season_table(year):
+    """The archived season as a pyarrow Table, decoded once per file version and kept."""
+    path = archived_seasons().get(year)
+    if path is None:
+        return None
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    with _lock:
+        cached = _tables.get(year)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    pa = _pyarrow()
+    table = pa.parquet.read_table(path, memory_map=True)
+    # Files written before a column was archived get it as all nulls, and
+    # older files' whole-second times are widened to microseconds
+    schema = _schema(pa)
+    for field in schema:
+        if field.name not in table.column_names:
+            table = table.append_column(field, pa.nulls(table.num_rows, field.type))
+    table = table.select(schema.names).cast(schema)
+    with _lock:
+        _tables[year] = (signature, table)
+    return table
+
+
+def _tables_for(years=None):
+    seasons = archived_seasons()
+    years = sorted(seasons if years is None else set(years) & set(seasons))
+    return [table for table in (season_table(year) for year in years) if table is not None]
+
+
+@lru_cache(maxsize=None)
+def _row_type(columns):
+    return namedtuple("ArchivedOrder", columns)
+
+
+def table_rows(table, columns):
+    """Rows of `columns` with attribute access, like the Row objects of a SELECT."""
+    row_type = _row_type(tuple(columns))
+    return [row_type(*values) for values in zip(*(table.column(c).to_pylist() for c in columns))]
+
+
+def archived_table(columns, years=None, start=None, end=None, teams=None, members=None, item_names=None):
+    """One pyarrow Table of the archived rows matching the filters (None = no filter)."""
+    tables = _tables_for(years)
+    if not tables:
+        return None
+    pa = _pyarrow()
+    pc = pa.compute
+    table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+    mask = None
+    def both(condition):
+        return condition if mask is None else pc.and_(mask, condition)
+    if start is not None:
+        mask = both(pc.greater_equal(table["date"], pa.scalar(start, pa.date32())))
+    if end is not None:
+        mask = both(pc.less_equal(table["date"], pa.scalar(end, pa.date32())))
+    for name, values in (("team", teams), ("member", members), ("item_name", item_names)):
+        if values is not None:
+            mask = both(pc.is_in(table[name], value_set=pa.array(list(values), pa.string())))
+    if mask is not None:
+        table = table.filter(mask)
+    return table.select(list(columns))
+
+
+def archived_rows(columns, start=None, end=None, team=None, item_names=None, order_by=()):
+    """Archived rows between start and end (dates) as namedtuples, sorted by `order_by` ascending."""
+    if not archived_seasons():
+        return []
+    years = None
+    if start is not None or end is not None:
+        first = start.year if start is not None else min(archived_seasons())
+        last = end.year if end is not None else max(archived_seasons())
+        years = range(first, last + 1)
+    table = archived_table(columns, years=years, start=start, end=end,
+                           teams=[team] if team else None, item_names=item_names)
+    if table is None:
+        return []
+    if order_by:
+        table = table.sort_by([(column, "ascending") for column in order_by])
+    return table_rows(table, columns)
+
+
+def archived_order_page(columns, team=None, member=None, item=None, year=None, week_id=None,
+                        after=None, limit=50):
+    """Up to `limit` archived rows, newest first on (date, time, id), past the `after` position.
+
+    Mirrors reports.order_page_stmt so the two pages can be merged.
+    """
+    seasons = archived_seasons()
+    if not seasons:
+        return []
+    years = set(seasons)
+    if week_id is not None:
+        week = week_by_id(week_id)
+        years &= {week.start.year, week.end.year}
+    elif year is not None:
+        years &= {year}
+    if after is not None:
+        years = {y for y in years if y <= after[0].year}
+    table = archived_table(COLUMNS, years=years, teams=[team] if team else None,
+                           members=[member] if member else None, item_names=[item] if item else None)
+    if table is None or table.num_rows == 0:
+        return []
+
+    pa = _pyarrow()
+    pc = pa.compute
+    if week_id is not None:
+        table = table.filter(pc.equal(table["week_id"], week_id))
+    elif year is not None:
+        table = table.filter(pc.and_(pc.greater_equal(table["date"], pa.scalar(date(year, 1, 1), pa.date32())),
+                                     pc.less_equal(table["date"], pa.scalar(date(year, 12, 31), pa.date32()))))
+    if after is not None:
+        day, clock, order_id = after
+        day, clock = pa.scalar(day, pa.date32()), pa.scalar(clock, pa.time64("us"))
+        times = table["time"]
+        table = table.filter(pc.or_(
+            pc.less(table["date"], day),
+            pc.and_(pc.equal(table["date"], day), pc.or_(
+                pc.less(times, clock),
+                pc.and_(pc.equal(times, clock), pc.less(table["id"], order_id)),
+            )),
+        ))
+    table = table.sort_by([("date", "descending"), ("time", "descending"), ("id", "descending")])
+    return table_rows(table.slice(0, limit), columns)
+
+
+def archived_groups(keys, years=None):
+    """[(key values..., quantity, spend)] summed over every archived row, grouped by `keys`."""
+    tables = _tables_for(years)
+    if not tables:
+        return []
+    pa = _pyarrow()
+    pc = pa.compute
+    table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+    table = table.append_column("spend", pc.multiply(table["price"], pc.cast(table["quantity"], pa.float64())))
+    table = table.set_column(table.schema.get_field_index("option"), "option",
+                             pc.fill_null(table["option"], ""))
+    grouped = table.group_by(list(keys)).aggregate([("quantity", "sum"), ("spend", "sum")])
+    return table_rows(grouped, list(keys) + ["quantity_sum", "spend_sum"])
+
+
+# === Writing ===
+
+def archive_season(year, dry_run=False):
+    """Move every Order row dated in `year` into the season's archive file.
+
+    Rows already archived for that season (an earlier run, or one interrupted
+    after writing the file) are kept; rows are deduplicated by id. Returns
+    (rows moved, total spend moved).
+    """
+    if year >= date.today().year:
+        raise ValueError(f"{year} is not a closed season")
+    pa = _pyarrow()
+    pc = pa.compute
+
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    rows = db.session.execute(
+        select(*(getattr(Order, c) for c in COLUMNS))
+        .where(Order.date >= start, Order.date <= end)
+        .order_by(Order.id)
+    ).all()
+    if not rows:
+        return 0, 0.0
+
+    existing = season_table(year)
+    existing_ids = set(existing["id"].to_pylist()) if existing is not None else set()
+    new = [row for row in rows if row.id not in existing_ids]
+    moved_spend = sum(row.price * row.quantity for row in rows)
+    if dry_run:
+        return len(rows), moved_spend
+
+    schema = _schema(pa)
+    # Rows from before the week_id column get it here, so archived rows always carry their week
+    columns = {c: [getattr(row, c) for row in new] for c in COLUMNS}
+    columns["week_id"] = [week_index(row.date) if row.week_id is None else row.week_id for row in new]
+    table = pa.table(columns, schema=schema)
+    if existing is not None:
+        table = pa.concat_tables([existing.cast(schema), table])
+    expected_rows = table.num_rows
+    expected_spend = pc.sum(pc.multiply(table["price"], pc.cast(table["quantity"], pa.float64()))).as_py()
+
+    # Write beside the final name and rename over it, so readers never see half a file
+    directory = archive_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, ARCHIVE_FILE.format(year=year))
+    tmp_path = path + ".tmp"
+    pa.parquet.write_table(table, tmp_path, compression="zstd")
+
+    check = pa.parquet.read_table(tmp_path, memory_map=True)
+    check_spend = pc.sum(pc.multiply(check["price"], pc.cast(check["quantity"], pa.float64()))).as_py()
+    if check.num_rows != expected_rows or abs(check_spend - expected_spend) > 0.005:
+        os.unlink(tmp_path)
+        raise RuntimeError(f"Archive of {year} did not read back correctly; Order rows left in place")
+    os.replace(tmp_path, path)
+
+    # Only rows that were read above; anything inserted since has a larger id
+    bump_order_data_version(rewritten=True)
+    db.session.execute(
+        Order.__table__.delete()
+        .where(Order.date >= start, Order.date <= end, Order.id <= rows[-1].id)
+    )
+    db.session.commit()
+    return len(rows), moved_spend
+
+
+def season_summaries():
+    """[{"year", "rows", "spend", "bytes"}] for each archived season."""
+    pa = None
+    summaries = []
+    for year, path in sorted(archived_seasons().items()):
+        pa = pa or _pyarrow()
+        table = season_table(year)
+        spend = pa.compute.sum(pa.compute.multiply(table["price"],
+                                                   pa.compute.cast(table["quantity"], pa.float64()))).as_py()
+        summaries.append({"year": year, "rows": table.num_rows, "spend": spend or 0.0,
+                          "bytes": os.path.getsize(path)})
+    return summaries
+
+
+def init_archive(app):
+    """Set ARCHIVE_DIR (env KSU_ARCHIVE_DIR) where season files are written and read."""
+    app.config.setdefault("ARCHIVE_DIR", os.environ.get("KSU_ARCHIVE_DIR", "order_archive"))
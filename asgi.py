@@ -0,0 +1,203 @@
+"""Optional ASGI entry point serving the read-only admin reports on an async engine.
+
+    pip install asgiref uvicorn aiosqlite      # asyncpg instead of aiosqlite for Postgres
+    uvicorn asgi:application --workers 2
+
+GETs of the weekly summary, produce & Hyvee, team orders and weekly totals pages and of
+/admin/all_orders.json are answered here without holding a thread while the database
+works. Every other request, including the whole order flow, goes to the unchanged Flask
+app through asgiref's WSGI adapter, so writes keep their transactions and the
+`gunicorn wsgi:app` deployment keeps working as before.
+"""
+import asyncio
+import json
+import re
+from datetime import datetime
+
+from flask import render_template
+from markupsafe import Markup
+from sqlalchemy.engine import make_url
+
+from app import create_app, order_page_args, session_user
+from db_config import database_url, engine_options
+from fragment_cache import fragments, order_data_version_of, order_data_version_stmt
+from reports import (archived_order_page_rows, format_order_row, merge_order_pages, order_page_result,
+                     order_page_stmt, produce_hyvee_page, team_orders_page, weekly_summary_page,
+                     weekly_totals_page)
+from weeks import current_week
+
+ASYNC_DRIVERS = {"sqlite": "aiosqlite", "postgresql": "asyncpg"}
+
+app = create_app()
+config = app.extensions["ksu_config"]
+
+
+def async_database_url(url):
+    """The DATABASE_URL with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise RuntimeError(f"No async driver configured for {backend}")
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+# === Report pages served natively ===
+
+def _weekly_summary():
+    return weekly_summary_page(current_week())
+
+def _produce_hyvee():
+    return produce_hyvee_page(current_week(), config.produce_hyvee_items())
+
+def _team_orders(team_name):
+    team_name = config.identity().team(team_name) or team_name
+    return team_orders_page(team_name, current_week(), config.budgets().get(team_name, 100.00))
+
+def _weekly_totals():
+    return weekly_totals_page(datetime.now().year, config.users())
+
+REPORT_ROUTES = [
+    (re.compile(r"^/admin/weekly_summary$"), _weekly_summary),
+    (re.compile(r"^/admin/produce_hyvee$"), _produce_hyvee),
+    (re.compile(r"^/admin/team/(?P<team_name>[^/]+)$"), _team_orders),
+    (re.compile(r"^/admin/weekly_totals$"), _weekly_totals),
+]
+ORDERS_JSON_PATH = "/admin/all_orders.json"
+
+
+class ReportApp:
+    """ASGI app: report GETs from admins on the async engine, everything else to Flask."""
+
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self._engine = None
+
+    @property
+    def engine(self):
+        # Created inside the running event loop on first use
+        if self._engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            url = database_url()
+            self._engine = create_async_engine(async_database_url(url), **engine_options(url))
+        return self._engine
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+
+        if scope["type"] == "http" and scope["method"] == "GET":
+            route = self._route(scope["path"])
+            if route is not None and await self._in_app(self._is_admin, scope):
+                build, params = route
+                if build is None:
+                    return await self._orders_json(scope, send)
+                return await self._report(scope, send, await self._in_app(build, **params))
+
+        # Logins, the order flow, writes and anything unauthenticated: plain Flask
+        await self.wsgi(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._engine is not None:
+                    await self._engine.dispose()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    # === Auth: read the Flask session cookie without going through Flask ===
+
+    def _session(self, scope):
+        cookie_name = self.flask_app.config["SESSION_COOKIE_NAME"]
+        for name, value in scope.get("headers", []):
+            if name != b"cookie":
+                continue
+            for part in value.decode("latin-1").split(";"):
+                key, _, raw = part.strip().partition("=")
+                if key == cookie_name and raw:
+                    serializer = self.flask_app.session_interface.get_signing_serializer(self.flask_app)
+                    max_age = int(self.flask_app.permanent_session_lifetime.total_seconds())
+                    try:
+                        return serializer.loads(raw, max_age=max_age)
+                    except Exception:
+                        return {}
+        return {}
+
+    def _is_admin(self, scope):
+        # Same rules as load_user and the Flask views; anyone else is handed to Flask for its 403/redirect
+        session = self._session(scope)
+        user = session_user(session.get("_user_id"), session)
+        return user is not None and (user.id == "admin" or bool(session.get("admin_as_football")))
+
+    # === Routing ===
+
+    def _route(self, path):
+        """(page builder, its arguments) for a path served here, (None, {}) for the orders JSON."""
+        if path == ORDERS_JSON_PATH:
+            return None, {}
+        for pattern, build in REPORT_ROUTES:
+            match = pattern.match(path)
+            if match:
+                return build, match.groupdict()
+        return None
+
+    async def _in_app(self, fn, *args, **kwargs):
+        # Roster, budget and archive lookups may query the database (ROSTER_SOURCE=db) and so
+        # need the app context; they run on a thread so the loop isn't held meanwhile
+        def call():
+            with self.flask_app.app_context():
+                return fn(*args, **kwargs)
+        return await asyncio.to_thread(call)
+
+    # === Responses ===
+
+    def _request_context(self, scope):
+        # url_for() in the templates needs a request context; nothing in it touches the database
+        headers = dict((k.decode("latin-1"), v.decode("latin-1")) for k, v in scope.get("headers", []))
+        host = headers.get("host", "localhost")
+        return self.flask_app.test_request_context(
+            scope["path"], base_url=f"{scope.get('scheme', 'http')}://{host}{scope.get('root_path', '')}",
+            query_string=scope.get("query_string", b""), headers=headers)
+
+    async def _report(self, scope, send, page):
+        async with self.engine.connect() as conn:
+            version = order_data_version_of((await conn.execute(order_data_version_stmt())).all())
+            key = page.key + (version,)
+            body = fragments.get(key)
+            if body is None:
+                results = {name: (await conn.execute(stmt)).all() for name, stmt in page.queries.items()}
+                with self._request_context(scope):
+                    body = Markup(render_template(page.template, **page.shape(**results)))
+                fragments.set(key, body)
+        await _respond(send, 200, body.encode("utf-8"), "text/html; charset=utf-8")
+
+    async def _orders_json(self, scope, send):
+        with self._request_context(scope):
+            args = order_page_args()
+        async with self.engine.connect() as conn:
+            rows = (await conn.execute(order_page_stmt(**args))).all()
+        # Archived seasons are Parquet files; decoding them is CPU and disk work, so off the loop
+        archived = await self._in_app(archived_order_page_rows, **args)
+        rows = merge_order_pages(rows, archived, args["limit"])
+        rows, next_cursor = order_page_result(rows, args["limit"])
+        body = json.dumps({"orders": [format_order_row(r) for r in rows], "next": next_cursor})
+        await _respond(send, 200, body.encode("utf-8"), "application/json")
+
+
+async def _respond(send, status, body, content_type):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", content_type.encode()),
+                    (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+application = ReportApp(app)
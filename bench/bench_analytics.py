@@ -0,0 +1,79 @@
+"""Season analytics: columnar fetch, incremental top-up and report compute time.
+
+    python -m bench.bench_analytics --orders 200000 --weeks 104
+
+Times analytics.order_frame() from cold, topping it up after --new orders,
+and each report on the cached frame, with NumPy and with the pure-Python
+fallback (NumPy rows are skipped when it isn't installed).
+"""
+import argparse
+from datetime import date, datetime
+
+from bench.common import load_app, seed_database, time_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--weeks", type=int, default=104)
+    parser.add_argument("--new", type=int, default=50, help="orders added before the top-up")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    app = load_app()
+    seed_database(app, args.orders, weeks=args.weeks)
+
+    import analytics
+    from fragment_cache import bump_order_data_version
+    from models import Order, db
+
+    numpy = analytics._numpy
+    backends = [("numpy", numpy)] if numpy() is not None else []
+    backends.append(("python", lambda: None))
+
+    year = date.today().year
+    teams = list(app.extensions["ksu_config"].users().keys())
+    budgets = {team: 100000.0 for team in teams}
+    reports = {
+        "season_team_weeks": lambda f: analytics.season_team_weeks(f, year),
+        "top_items": lambda f: analytics.top_items(f, year),
+        "top_items(team)": lambda f: analytics.top_items(f, year, teams[0]),
+        "member_consumption": lambda f: analytics.member_consumption(f, year),
+        "burn_rates": lambda f: analytics.burn_rates(f, budgets),
+    }
+
+    print(f"{'backend':<8}{'step':<22}{'p50':>10}{'p95':>10}  (ms)")
+    with app.app_context():
+        for name, backend in backends:
+            analytics._numpy = backend
+
+            def cold():
+                analytics.clear_frame()
+                analytics.order_frame()
+
+            stats = time_call(cold, repeat=max(2, args.repeat // 3))
+            print(f"{name:<8}{'cold fetch':<22}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+
+            def top_up():
+                bump_order_data_version()
+                db.session.execute(Order.__table__.insert(), [{
+                    "team": teams[i % len(teams)], "member": "Bench Member", "date": date.today(),
+                    "time": datetime.now().time(), "item_name": "Bench Item", "option": "",
+                    "quantity": 1, "price": 1.0,
+                } for i in range(args.new)])
+                db.session.commit()
+                analytics.order_frame()
+
+            stats = time_call(top_up, repeat=args.repeat)
+            print(f"{name:<8}{f'top-up +{args.new}':<22}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+
+            frame = analytics.order_frame()
+            for report, fn in reports.items():
+                stats = time_call(lambda: fn(frame), repeat=args.repeat)
+                print(f"{name:<8}{report:<22}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}")
+        analytics._numpy = numpy
+    print(f"\n{len(frame):,} order lines in the frame")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Concurrent submits against team budgets: no overspend, and submit throughput.
+
+    python -m bench.bench_budget --threads 16 --submits 40 --fill 0.75
+    BENCH_DATABASE_URL=postgresql://localhost/ksu_bench python -m bench.bench_budget --naive
+
+Two phases, each from an empty ledger: every thread ordering for one team (the
+worst case for the per-team row lock), then threads spread over all teams.
+Threads submit pre-built random orders through save_user_order; each team's
+budget covers --fill of what its threads will ask for, so every team runs into
+its budget part way through. Afterwards the orders stored for every team must
+fit its budget and match the ledger; the run exits non-zero if any don't. --naive adds the old read-then-write check
+for contrast, which is expected to overspend under contention.
+"""
+import argparse
+import random
+import threading
+import time
+from datetime import datetime
+
+from bench.bench_submit import order_items
+from bench.common import load_app, summarize
+
+
+def reset(db):
+    from models import Order, TeamSpend, WeeklyRollup
+
+    for model in (Order, TeamSpend, WeeklyRollup):
+        db.session.execute(model.__table__.delete())
+    db.session.commit()
+
+
+def checked_save(save_user_order, member, items, budget):
+    save_user_order(member, datetime.now(), items, budget=budget)
+
+
+def naive_save(save_user_order, member, items, budget):
+    # Read the total, decide, then write: two submits can both pass the check
+    from flask import session
+    from ledger import BudgetExceeded, budget_period, get_team_spent, order_amount
+
+    team = session["team"]
+    spent = get_team_spent(team, budget_period(datetime.now().date()))
+    if spent + order_amount(items) > budget:
+        raise BudgetExceeded(team, order_amount(items), budget - spent)
+    save_user_order(member, datetime.now(), items)
+
+
+def run_phase(app, save, teams, threads, submits, fill, lines, seed):
+    from flask import session
+    from app import save_user_order
+    from catalog import get_catalog
+    from ledger import BudgetExceeded, order_amount
+    from models import db
+
+    with app.app_context():
+        reset(db)
+        catalog = get_catalog(app.extensions["ksu_config"])
+
+    # Thread i orders for teams[i % len(teams)]; budgets cover `fill` of each team's demand
+    batches = []
+    demand = {team: 0.0 for team in teams}
+    for i in range(threads):
+        rng = random.Random(seed + i)
+        batches.append([order_items(catalog, rng.randint(1, lines), rng) for _ in range(submits)])
+        demand[teams[i % len(teams)]] += sum(order_amount(items) for items in batches[i])
+    budgets = {team: round(total * fill, 2) for team, total in demand.items()}
+
+    lock = threading.Lock()
+    latencies, counts = [], {"accepted": 0, "rejected": 0, "errors": 0}
+    per_team = {team: 0 for team in teams}
+    start_line = threading.Barrier(threads)
+
+    def worker(i):
+        team = teams[i % len(teams)]
+        member = f"Budget Member {i}"
+        local, accepted, rejected, errors = [], 0, 0, 0
+        with app.test_request_context():
+            session["team"] = team
+            start_line.wait()
+            for items in batches[i]:
+                started = time.perf_counter()
+                try:
+                    save(save_user_order, member, items, budgets[team])
+                    accepted += 1
+                except BudgetExceeded:
+                    rejected += 1
+                except Exception:
+                    db.session.rollback()
+                    errors += 1
+                local.append((time.perf_counter() - started) * 1000.0)
+        with lock:
+            latencies.extend(local)
+            counts["accepted"] += accepted
+            counts["rejected"] += rejected
+            counts["errors"] += errors
+            per_team[team] += accepted
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    started = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        overspent = check_budgets(db, budgets)
+    return {
+        "seconds": elapsed,
+        "submits_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "accepted_per_sec": counts["accepted"] / elapsed if elapsed else 0.0,
+        "latency": summarize(latencies),
+        "accepted_per_team": per_team,
+        "budgets": budgets,
+        "overspent": overspent,
+        **counts,
+    }
+
+
+def check_budgets(db, budgets):
+    """{team: (stored spend, ledger total, budget)} for every team over budget or out of step with the ledger."""
+    from sqlalchemy import func, select
+    from ledger import BUDGET_TOLERANCE, get_team_spent, budget_period
+    from models import Order
+
+    period = budget_period(datetime.now().date())
+    stored = dict(db.session.execute(
+        select(Order.team, func.sum(Order.price * Order.quantity)).group_by(Order.team)
+    ).all())
+    problems = {}
+    for team, budget in budgets.items():
+        spent, ledger = stored.get(team) or 0.0, get_team_spent(team, period)
+        if spent > budget + BUDGET_TOLERANCE or abs(spent - ledger) > BUDGET_TOLERANCE:
+            problems[team] = (spent, ledger, budget)
+    return problems
+
+
+def print_phase(name, r):
+    lat = r["latency"]
+    print(f"\n{name}: {r['submits_per_sec']:,.0f} submits/s ({r['accepted_per_sec']:,.0f} accepted/s) "
+          f"over {r['seconds']:.1f}s; p50 {lat['p50_ms']:.1f} ms, p95 {lat['p95_ms']:.1f} ms")
+    print(f"  accepted {r['accepted']}, refused over budget {r['rejected']}, errors {r['errors']}")
+    if r["overspent"]:
+        for team, (spent, ledger, budget) in sorted(r["overspent"].items()):
+            print(f"  OVERSPENT {team}: orders ${spent:,.2f}, ledger ${ledger:,.2f}, budget ${budget:,.2f}")
+    else:
+        print(f"  all {len(r['budgets'])} teams within budget; ledger matches orders")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--submits", type=int, default=40, help="orders each thread submits")
+    parser.add_argument("--lines", type=int, default=5, help="most lines per order")
+    parser.add_argument("--fill", type=float, default=0.75,
+                        help="each team's budget as a fraction of what its threads order")
+    parser.add_argument("--naive", action="store_true", help="also run the unlocked read-then-write check")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    app = load_app()
+    teams = [t for t in app.extensions["ksu_config"].users().keys() if t != "KSU Football"]
+
+    savers = [("locked", checked_save)] + ([("naive", naive_save)] if args.naive else [])
+    failed = False
+    for label, save in savers:
+        for name, phase_teams in (("one team", teams[:1]), ("all teams", teams)):
+            result = run_phase(app, save, phase_teams, args.threads, args.submits, args.fill,
+                               args.lines, args.seed)
+            print_phase(f"{label}, {name}, {args.threads} threads", result)
+            failed |= label == "locked" and bool(result["overspent"] or result["errors"])
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
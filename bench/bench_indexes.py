@@ -0,0 +1,93 @@
+"""Per-route query latency for the admin views, with and without Order indexes.
+
+    python -m bench.bench_indexes --orders 200000 --weeks 52
+
+Uses a throwaway SQLite file unless BENCH_DATABASE_URL points at a Postgres.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from bench.common import load_app, seed_orders, time_call
+
+
+def route_queries(Order, config):
+    from weeks import current_week
+
+    week = current_week()
+    produce = config.produce_hyvee_items()
+    some_team = Order.query.with_entities(Order.team).first()[0]
+    some_member = Order.query.with_entities(Order.member).first()[0]
+
+    return {
+        "admin_produce_hyvee": Order.query.filter(
+            Order.week_id == week.id, Order.item_name.in_(produce)
+        ).order_by(Order.date.desc()),
+        "view_team_orders": Order.query.filter(
+            Order.week_id == week.id, Order.team == some_team
+        ).order_by(Order.date, Order.time),
+        "admin_weekly_summary": Order.query.filter(
+            Order.week_id == week.id
+        ).order_by(Order.date.desc(), Order.time.desc()),
+        "view_user_file": Order.query.filter(
+            Order.member == some_member, Order.date >= week.start, Order.date <= week.end
+        ).order_by(Order.date, Order.time),
+    }
+
+
+def explain(db, query):
+    statement = query.statement.compile(db.engine, compile_kwargs={"literal_binds": True})
+    prefix = "EXPLAIN QUERY PLAN " if db.engine.dialect.name == "sqlite" else "EXPLAIN "
+    with db.engine.connect() as conn:
+        return [" ".join(str(c) for c in row) for row in conn.execute(text(prefix + str(statement)))]
+
+
+def run_all(db, queries, repeat, show_plans):
+    results = {}
+    for name, query in queries.items():
+        if show_plans:
+            print(f"-- {name}")
+            for line in explain(db, query):
+                print("   ", line)
+        results[name] = time_call(query.all, repeat)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--weeks", type=int, default=52)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--explain", action="store_true", help="print query plans too")
+    args = parser.parse_args()
+
+    app = load_app()
+    from models import Order, db
+    from schema import upgrade_schema
+
+    with app.app_context():
+        seed_orders(db, args.orders, weeks=args.weeks)
+        db.session.execute(text("ANALYZE"))
+        db.session.commit()
+        queries = route_queries(Order, app.extensions["ksu_config"])
+
+        with_ix = run_all(db, queries, args.repeat, args.explain)
+
+        db.session.commit()
+        for index in Order.__table__.indexes:
+            index.drop(db.engine)
+        db.engine.dispose()  # drop cached statements/plans held by pooled connections
+        without_ix = run_all(db, queries, args.repeat, args.explain)
+
+        upgrade_schema()
+        dialect = db.engine.dialect.name
+
+    print(f"{args.orders} orders over {args.weeks} weeks ({dialect})")
+    print(f"{'route':<24}{'indexed p50':>14}{'p95':>10}{'no index p50':>16}{'p95':>10}")
+    for name in queries:
+        a, b = with_ix[name], without_ix[name]
+        print(f"{name:<24}{a['p50_ms']:>12.2f}ms{a['p95_ms']:>8.2f}ms{b['p50_ms']:>14.2f}ms{b['p95_ms']:>8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Worker boot time and memory: import, create_app() and the first request.
+
+    python -m bench.bench_startup --runs 15 --save bench/baselines/startup.json
+    python -m bench.bench_startup --compare bench/baselines/startup.json
+
+Each run is a fresh interpreter, so every import is paid again the way a new
+gunicorn worker (or a worker without preload_app) pays it. Reports the median
+and worst time per stage and the peak RSS after the first request.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from bench.common import ROOT
+
+# Runs inside the child interpreter; prints one JSON line of timings
+CHILD = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+import app as app_module
+t1 = time.perf_counter()
+app = app_module.create_app()
+t2 = time.perf_counter()
+response = app.test_client().get("/login")
+t3 = time.perf_counter()
+assert response.status_code == 200, response.status_code
+print(json.dumps({
+    "import_ms": (t1 - t0) * 1000.0,
+    "create_app_ms": (t2 - t1) * 1000.0,
+    "first_request_ms": (t3 - t2) * 1000.0,
+    "total_ms": (t3 - t0) * 1000.0,
+    "modules": len(sys.modules),
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+"""
+
+STAGES = ("import_ms", "create_app_ms", "first_request_ms", "total_ms", "modules", "max_rss_kb")
+
+
+def run_once(env):
+    out = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def run(runs, database_url=None):
+    env = dict(os.environ)
+    env["DATABASE_URL"] = database_url or os.environ.get("BENCH_DATABASE_URL") or \
+        "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ksu-bench-"), "bench.db")
+    env.pop("KSU_METRICS", None)
+
+    run_once(env)  # warm the OS file cache and __pycache__
+    samples = [run_once(env) for _ in range(runs)]
+    return {
+        stage: {"median": statistics.median(s[stage] for s in samples),
+                "max": max(s[stage] for s in samples)}
+        for stage in STAGES
+    }
+
+
+def print_table(results):
+    print(f"{'stage':<20}{'median':>12}{'max':>12}")
+    for stage in STAGES:
+        r = results[stage]
+        print(f"{stage:<20}{r['median']:>12,.1f}{r['max']:>12,.1f}")
+
+
+def compare(current, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('created')}); flagging medians > +{threshold:.0%}")
+    regressions = 0
+    for stage in STAGES:
+        old = baseline["stages"].get(stage, {}).get("median")
+        new = current["stages"][stage]["median"]
+        if not old:
+            continue
+        change = new / old - 1.0
+        flag = "  REGRESSION" if change > threshold else ""
+        regressions += bool(flag)
+        print(f"  {stage:<20}{old:>12,.1f} -> {new:>12,.1f} ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=15, help="fresh interpreters to time")
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare with a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="median regression threshold")
+    args = parser.parse_args()
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "stages": run(args.runs),
+    }
+    print_table(results["stages"])
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
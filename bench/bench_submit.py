@@ -0,0 +1,83 @@
+"""Order-submit throughput: per-object ORM adds vs the batched save_user_order.
+
+    python -m bench.bench_submit --sizes 10 30 60 120 --orders 200
+
+Both paths write the same rows and maintain the ledger and weekly rollup in
+one transaction, so the difference is the INSERT strategy alone.
+"""
+import argparse
+import random
+import time
+from datetime import datetime
+
+from bench.common import load_app
+
+
+def order_items(catalog, size, rng):
+    options = [opt for opt in catalog.options if opt is not None]
+    return [{
+        "item_id": opt.item_id,
+        "option_id": opt.id,
+        "name": opt.item_name,
+        "option": opt.name,
+        "price": opt.price,
+        "quantity": rng.randint(1, 4),
+    } for opt in rng.sample(options, min(size, len(options)))]
+
+
+def legacy_save(db, Order, ledger, team, member, when, items):
+    # What save_user_order did before batching: one ORM object per line
+    for item in items:
+        db.session.add(Order(
+            team=team, member=member, date=when.date(), time=when.time(),
+            item_name=item["name"], option=item["option"], quantity=item["quantity"],
+            price=item["price"], item_id=item["item_id"], option_id=item["option_id"],
+        ))
+    ledger.record_order_spend(team, when.date(), items)
+    ledger.record_order_rollup(team, member, when.date(), items)
+    db.session.commit()
+
+
+def run(save, catalog, size, orders, rng):
+    batches = [order_items(catalog, size, rng) for _ in range(orders)]
+    start = time.perf_counter()
+    for items in batches:
+        save(items)
+    elapsed = time.perf_counter() - start
+    return (size * orders) / elapsed, elapsed / orders * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 30, 60, 120])
+    parser.add_argument("--orders", type=int, default=200, help="orders submitted per size")
+    args = parser.parse_args()
+
+    app = load_app()
+    import ledger
+    from flask import session
+    from app import save_user_order
+    from catalog import get_catalog
+    from models import Order, db
+
+    rng = random.Random(7)
+    team, member = "KSU Football", "Bench Member"
+
+    print(f"{'lines':>6}{'per-object lines/s':>20}{'ms/order':>10}{'batched lines/s':>18}{'ms/order':>10}{'speedup':>9}")
+    with app.test_request_context():
+        session["team"] = team
+        catalog = get_catalog(app.extensions["ksu_config"])
+
+        for size in args.sizes:
+            legacy_rate, legacy_ms = run(
+                lambda items: legacy_save(db, Order, ledger, team, member, datetime.now(), items),
+                catalog, size, args.orders, rng)
+            bulk_rate, bulk_ms = run(
+                lambda items: save_user_order(member, datetime.now(), items),
+                catalog, size, args.orders, rng)
+            print(f"{size:>6}{legacy_rate:>20,.0f}{legacy_ms:>10.2f}{bulk_rate:>18,.0f}{bulk_ms:>10.2f}"
+                  f"{bulk_rate / legacy_rate:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
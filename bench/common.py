@@ -0,0 +1,137 @@
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from metrics import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(database_url=None):
+    """Build the Flask app against a throwaway database.
+
+    Defaults to a fresh SQLite file; pass a URL (or set BENCH_DATABASE_URL)
+    to run against a local Postgres instead.
+    """
+    url = database_url or os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(prefix="ksu-bench-"), "bench.db")
+    os.environ["DATABASE_URL"] = url
+
+    os.chdir(ROOT)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+    from app import create_app
+    from schema import upgrade_schema
+
+    app = create_app()
+    with app.app_context():
+        upgrade_schema()
+    return app
+
+
+def menu_choices():
+    with open(os.path.join(ROOT, "structured_menu.json")) as f:
+        menu = json.load(f)
+    return [
+        (item, opt["name"], opt["price"])
+        for group in menu.values()
+        for item, options in group.items()
+        for opt in options
+    ]
+
+
+def roster():
+    with open(os.path.join(ROOT, "users.json")) as f:
+        users = json.load(f)
+    pairs = []
+    for team, members in users.items():
+        members = [m.strip() for m in members if m.strip()] or [f"{team} Member"]
+        pairs.extend((team, m) for m in members)
+    return pairs
+
+
+def seed_orders(db, n_orders, weeks=52, batch_size=5000, seed=1234):
+    """Insert n_orders synthetic Order rows spread over the last `weeks` weeks."""
+    from fragment_cache import bump_order_data_version
+    from models import Order
+    from weeks import week_index
+
+    rng = random.Random(seed)
+    choices = menu_choices()
+    people = roster()
+    end = datetime.now()
+    span_seconds = weeks * 7 * 24 * 3600
+
+    table = Order.__table__
+    bump_order_data_version()
+    batch = []
+    lines_left = 0
+    for _ in range(n_orders):
+        # Lines come in submits of 1-8 sharing one timestamp, with microseconds like
+        # datetime.now() in save_user_order, so keyset paging sees real ties
+        if lines_left == 0:
+            lines_left = rng.randint(1, 8)
+            team, member = rng.choice(people)
+            when = end - timedelta(seconds=rng.randrange(span_seconds), microseconds=rng.randrange(1000000))
+        lines_left -= 1
+        item, option, price = rng.choice(choices)
+        batch.append({
+            "team": team,
+            "member": member,
+            "date": when.date(),
+            "time": when.time(),
+            "week_id": week_index(when.date()),
+            "item_name": item,
+            "option": option,
+            "quantity": rng.randint(1, 6),
+            "price": price,
+        })
+        if len(batch) >= batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+    db.session.commit()
+
+
+def seed_database(app, n_orders, weeks=52):
+    """Seed orders like seed_orders, then link catalog ids and rebuild the aggregates
+    so every report page sees the same state the live app would have built."""
+    from catalog import backfill_order_ids, get_catalog
+    from ledger import rebuild_ledger, rebuild_rollups
+    from models import db
+
+    with app.app_context():
+        seed_orders(db, n_orders, weeks=weeks)
+        backfill_order_ids(get_catalog(app.extensions["ksu_config"]))
+        rebuild_ledger()
+        rebuild_rollups()
+
+
+def time_call(fn, repeat=20):
+    """Run fn `repeat` times (after one warm-up call) and return latency stats in ms."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return summarize(samples)
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(ordered),
+        "mean_ms": statistics.fmean(ordered) if ordered else 0.0,
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+    }
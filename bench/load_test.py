@@ -0,0 +1,358 @@
+"""Load test for the order flow and every admin report.
+
+    python -m bench.load_test --orders 50000 --weeks 26 --iterations 30 \\
+        --threads 8 --duration 15 --save bench/baselines/local.json
+    python -m bench.load_test ... --compare bench/baselines/local.json
+
+Phase 1 drives each route through Flask's test client to get per-route latency.
+Phase 2 serves the app on a local threaded HTTP server and runs a mixed
+workload from several threads to measure throughput under concurrency.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import re
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+from bench.common import ROOT, load_app, seed_database, summarize
+
+ADMIN = ("KSU Football", "Scott Trausch")
+ORDER_LINES = 5
+# Budget given to every team in the load roster, far above anything a run can spend
+LOAD_BUDGET = 10_000_000.0
+
+
+def admin_routes(teams):
+    team = urllib.parse.quote(teams[0]) if teams else "KSU%20Baseball"
+    return {
+        "admin_weekly_totals": "/admin/weekly_totals",
+        "admin_all_orders": "/admin/all_orders",
+        "admin_team_orders": f"/admin/team/{team}",
+        "admin_weekly_summary": "/admin/weekly_summary",
+        "admin_produce_hyvee": "/admin/produce_hyvee",
+        "export_weekly_summary": "/admin/weekly_summary/export",
+        "export_produce_hyvee": "/admin/produce_hyvee/export",
+    }
+
+
+def use_load_roster(app, per_team):
+    """Point the app at a copy of users.json with at least per_team members on each team,
+    and budgets large enough that no submit is refused for going over.
+
+    Returns the (team, member) pairs that order. The real JSON files are left alone.
+    """
+    from config_store import BUDGET_FILE, CachedJsonFile, USERS_FILE
+
+    config = app.extensions["ksu_config"]
+    users = {}
+    for team, members in config.users().items():
+        members = [m.strip() for m in members if m.strip()]
+        if team != ADMIN[0]:
+            members += [f"Load Member {k}" for k in range(len(members), per_team)]
+        users[team] = members
+
+    directory = tempfile.mkdtemp(prefix="ksu-load-")
+    users_file = CachedJsonFile(os.path.join(directory, USERS_FILE))
+    users_file.write(users)
+    config.users_file = users_file
+    budgets_file = CachedJsonFile(os.path.join(directory, BUDGET_FILE))
+    budgets_file.write({team: LOAD_BUDGET for team in users})
+    config.budgets_file = budgets_file
+    return [(team, m) for team, members in users.items() if team != ADMIN[0] for m in members]
+
+
+def order_form(html, rng):
+    keys = re.findall(r'name="(qty_\d+)"', html)
+    form = {k: str(rng.randint(1, 3)) for k in rng.sample(keys, min(ORDER_LINES, len(keys)))}
+    form["action"] = "review"
+    return form
+
+
+# === Phase 1: per-route latency through the test client ===
+
+class ClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def login(self, team, member):
+        self.client.post("/login", data={"team_name": team, "member_name": member})
+
+    def get(self, path):
+        response = self.client.get(path)
+        body = response.get_data(as_text=True) if response.mimetype == "text/html" else ""
+        return response.status_code, body
+
+    def post(self, path, data):
+        return self.client.post(path, data=data).status_code
+
+
+def timed(samples, name, fn):
+    start = time.perf_counter()
+    result = fn()
+    samples.setdefault(name, []).append((time.perf_counter() - start) * 1000.0)
+    return result
+
+
+def order_flow(driver, team, member, rng, samples):
+    timed(samples, "login", lambda: driver.login(team, member))
+    _, html = timed(samples, "order_form", lambda: driver.get("/order?new=1"))
+    timed(samples, "add_to_order", lambda: driver.post("/add_to_order", order_form(html, rng)))
+    timed(samples, "order_review", lambda: driver.get("/order/review"))
+    timed(samples, "order_submit", lambda: driver.post("/order/submit", {}))
+
+
+def run_client_phase(app, people, routes, iterations, rng):
+    samples = {}
+    for _ in range(iterations):
+        team, member = rng.choice(people)
+        order_flow(ClientDriver(app), team, member, rng, samples)
+
+    admin = ClientDriver(app)
+    admin.login(*ADMIN)
+    for name, path in routes.items():
+        admin.get(path)  # warm-up
+        for _ in range(iterations):
+            status, _ = timed(samples, name, lambda: admin.get(path))
+            if status != 200:
+                raise RuntimeError(f"{path} returned {status}")
+    return {name: summarize(values) for name, values in samples.items()}
+
+
+def check_order_paging(app, page_size=250):
+    """Walk /admin/all_orders.json page by page; every order must appear exactly once.
+
+    The seeded and submitted orders share timestamps down to the microsecond,
+    so this catches a cursor that loses rows at page boundaries.
+    """
+    from models import Order, db
+
+    admin = app.test_client()
+    admin.post("/login", data={"team_name": ADMIN[0], "member_name": ADMIN[1]})
+    seen, cursor = 0, None
+    while True:
+        query = {"limit": page_size, **({"after": cursor} if cursor else {})}
+        body = admin.get(f"/admin/all_orders.json?{urllib.parse.urlencode(query)}").get_json()
+        seen += len(body["orders"])
+        cursor = body["next"]
+        if not cursor:
+            break
+    with app.app_context():
+        total = db.session.query(Order).count()
+    return seen, total
+
+
+# Menu patches that must be refused with a 400 and leave the menu file untouched
+BAD_PATCHES = [
+    {"op": "update", "price": "nan"},
+    {"op": "update", "price": "inf"},
+    {"op": "update", "price": "-Infinity"},
+    {"op": "update", "price": -1},
+    {"op": "add", "group": "Bench", "item": "Bench Item", "option": "Plain", "price": "NaN"},
+]
+
+
+def check_menu_patches(app):
+    """POST invalid edits to /admin/menu/patch; returns the ones not refused with a 400."""
+    from catalog import get_catalog
+
+    config = app.extensions["ksu_config"]
+    with app.app_context():
+        catalog = get_catalog(config)
+        option_id = next(opt.id for opt in catalog.options if opt is not None)
+        version = catalog.version
+    admin = app.test_client()
+    admin.post("/login", data={"team_name": ADMIN[0], "member_name": ADMIN[1]})
+
+    bodies = [[1], "x", {"base_version": version, "ops": [1]}]
+    bodies += [{"base_version": version, "ops": [dict(op, option_id=option_id)]} for op in BAD_PATCHES]
+    accepted = [body for body in bodies if admin.post("/admin/menu/patch", json=body).status_code != 400]
+    with app.app_context():
+        if config.menu_version() != version:
+            accepted.append("menu changed")
+    return accepted
+
+
+# === Phase 2: concurrent HTTP load ===
+
+class HttpDriver(ClientDriver):
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def _open(self, path, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+            payload = response.read()
+            is_html = response.headers.get_content_type() == "text/html"
+            return response.status, payload.decode("utf-8", "replace") if is_html else ""
+
+    def login(self, team, member):
+        self._open("/login", {"team_name": team, "member_name": member})
+
+    def get(self, path):
+        return self._open(path)
+
+    def post(self, path, data):
+        return self._open(path, data)[0]
+
+
+def run_http_phase(app, people, routes, threads, duration, admin_share):
+    import logging
+    from werkzeug.serving import make_server
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    samples, errors = {}, []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed):
+        # Each thread orders as its own slice of the roster, like one person per device
+        rng = random.Random(seed)
+        mine = people[seed::threads] or people
+        local = {}
+        admin = HttpDriver(base_url)
+        admin.login(*ADMIN)
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < admin_share:
+                    name, path = rng.choice(list(routes.items()))
+                    timed(local, name, lambda: admin.get(path))
+                else:
+                    team, member = rng.choice(mine)
+                    order_flow(HttpDriver(base_url), team, member, rng, local)
+            except Exception as e:
+                with lock:
+                    errors.append(f"{getattr(e, 'url', '')} {e!r}")
+        with lock:
+            for name, values in local.items():
+                samples.setdefault(name, []).extend(values)
+
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    server.shutdown()
+
+    total = sum(len(v) for v in samples.values())
+    return {
+        "threads": threads,
+        "seconds": elapsed,
+        "requests": total,
+        "requests_per_sec": total / elapsed if elapsed else 0.0,
+        "errors": len(errors),
+        "sample_errors": errors[:5],
+        "routes": {name: summarize(values) for name, values in samples.items()},
+    }
+
+
+# === Reporting ===
+
+def print_table(title, routes):
+    print(f"\n{title}")
+    print(f"{'route':<24}{'n':>6}{'mean':>10}{'p50':>10}{'p95':>10}{'p99':>10}  (ms)")
+    for name, s in sorted(routes.items()):
+        print(f"{name:<24}{s['n']:>6}{s['mean_ms']:>10.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}")
+
+
+def compare(current, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nCompared with {baseline_path} ({baseline.get('created')}); flagging p95 > +{threshold:.0%}")
+    regressions = 0
+    for phase in ("client", "http"):
+        old_routes = baseline.get(phase, {}).get("routes", baseline.get(phase, {}))
+        new_routes = current.get(phase, {}).get("routes", current.get(phase, {}))
+        for name, new in sorted(new_routes.items()):
+            old = old_routes.get(name)
+            if not old or not old["p95_ms"]:
+                continue
+            change = new["p95_ms"] / old["p95_ms"] - 1.0
+            flag = "  REGRESSION" if change > threshold else ""
+            regressions += bool(flag)
+            print(f"  {phase:<7}{name:<24}{old['p95_ms']:>9.2f} -> {new['p95_ms']:>9.2f} ms ({change:+.0%}){flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--orders", type=int, default=20000, help="historical orders to seed")
+    parser.add_argument("--weeks", type=int, default=26, help="weeks the seeded orders span")
+    parser.add_argument("--members-per-team", type=int, default=10,
+                        help="pad each team's roster to this many members for the order flow")
+    parser.add_argument("--iterations", type=int, default=20, help="test-client samples per route")
+    parser.add_argument("--threads", type=int, default=8, help="HTTP load threads (0 skips the phase)")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of HTTP load")
+    parser.add_argument("--admin-share", type=float, default=0.3,
+                        help="fraction of HTTP iterations that hit admin reports")
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare with a saved JSON baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="p95 regression threshold")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    app = load_app()
+    app.config["TESTING"] = True
+    seed_database(app, args.orders, weeks=args.weeks)
+
+    people = use_load_roster(app, args.members_per_team)
+    teams = sorted({t for t, _ in people})
+    routes = admin_routes(teams)
+    rng = random.Random(args.seed)
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "database": os.environ["DATABASE_URL"].split(":", 1)[0],
+        "params": vars(args),
+        "client": run_client_phase(app, people, routes, args.iterations, rng),
+    }
+    print_table("Test client (single-threaded)", results["client"])
+
+    seen, total = check_order_paging(app)
+    print(f"\nAll-orders paging returned {seen:,} of {total:,} orders")
+    if seen != total:
+        raise SystemExit(1)
+    accepted = check_menu_patches(app)
+    print(f"Invalid menu patches accepted: {accepted or 'none'}")
+    if accepted:
+        raise SystemExit(1)
+
+    if args.threads > 0:
+        results["http"] = run_http_phase(app, people, routes, args.threads, args.duration, args.admin_share)
+        http = results["http"]
+        print_table(f"HTTP, {http['threads']} threads for {http['seconds']:.1f}s: "
+                    f"{http['requests_per_sec']:.1f} req/s, {http['errors']} errors", http["routes"])
+        for error in http["sample_errors"]:
+            print(f"  error: {error}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        regressions = compare(results, os.path.join(ROOT, args.compare) if not os.path.isabs(args.compare)
+                              else args.compare, args.threshold)
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Cart, CartLine
+
+# Carts untouched for this long are dropped by sweep_expired_carts
+CART_TTL = timedelta(days=7)
+
+def qty_key(option_id):
+    # Name of the quantity input for a catalog option in order.html / order_edit.html
+    return f"qty_{option_id}"
+
+def parse_order_form(form, catalog):
+    """{option_id: quantity} for every positive qty_<option id> field naming a live option."""
+    lines = {}
+    for key, value in form.items():
+        if not key.startswith("qty_"):
+            continue
+        option_id = key[4:]
+        value = (value or "0").strip()
+        if not option_id.isdigit() or not value.isdigit() or int(value) <= 0:
+            continue
+        if catalog.option(int(option_id)) is None:
+            continue
+        lines[int(option_id)] = int(value)
+    return lines
+
+def _is_expired(cart, now):
+    return cart.updated_at < now - CART_TTL
+
+def get_cart(team, member, create=False):
+    now = datetime.now()
+    cart = Cart.query.filter_by(team=team, member=member).first()
+    if cart is not None and _is_expired(cart, now):
+        db.session.delete(cart)
+        db.session.flush()
+        cart = None
+    if cart is None and create:
+        cart = Cart(team=team, member=member, updated_at=now)
+        try:
+            with db.session.begin_nested():
+                db.session.add(cart)
+        except IntegrityError:
+            # Another request (second tab/device) created it first; use theirs
+            cart = Cart.query.filter_by(team=team, member=member).one()
+    return cart
+
+def cart_lines(team, member):
+    cart = get_cart(team, member)
+    return list(cart.lines) if cart is not None else []
+
+def set_lines(team, member, lines, catalog):
+    """Replace the cart's contents with {option_id: quantity}."""
+    cart = get_cart(team, member, create=True)
+    existing = {line.option_id: line for line in cart.lines}
+
+    for option_id, line in existing.items():
+        if option_id not in lines:
+            cart.lines.remove(line)
+    for option_id, quantity in lines.items():
+        line = existing.get(option_id)
+        if line is None:
+            item_id = catalog.option(option_id).item_id
+            cart.lines.append(CartLine(item_id=item_id, option_id=option_id, quantity=quantity))
+        else:
+            line.quantity = quantity
+
+    cart.updated_at = datetime.now()
+    db.session.commit()
+
+def update_line(team, member, option_id, quantity, catalog):
+    """Set one line's quantity; zero or less removes it."""
+    cart = get_cart(team, member, create=True)
+    line = next((l for l in cart.lines if l.option_id == option_id), None)
+
+    if quantity <= 0:
+        if line is not None:
+            cart.lines.remove(line)
+    elif line is None:
+        item_id = catalog.option(option_id).item_id
+        cart.lines.append(CartLine(item_id=item_id, option_id=option_id, quantity=quantity))
+    else:
+        line.quantity = quantity
+
+    cart.updated_at = datetime.now()
+    db.session.commit()
+
+def add_line(team, member, option_id, catalog, quantity=1):
+    current = next((l.quantity for l in cart_lines(team, member) if l.option_id == option_id), 0)
+    update_line(team, member, option_id, current + quantity, catalog)
+
+def remove_line(team, member, option_id, catalog):
+    update_line(team, member, option_id, 0, catalog)
+
+def clear_cart(team, member, commit=True):
+    cart = Cart.query.filter_by(team=team, member=member).first()
+    if cart is not None:
+        db.session.delete(cart)
+    if commit:
+        db.session.commit()
+
+def priced_items(lines, catalog):
+    """(items, total) for cart lines at current catalog prices; retired options are dropped."""
+    items = []
+    total = 0.0
+    for line in lines:
+        opt = catalog.option(line.option_id)
+        if opt is None:
+            continue
+        subtotal = opt.price * line.quantity
+        total += subtotal
+        items.append({
+            "item_id": opt.item_id,
+            "option_id": opt.id,
+            "name": opt.item_name,
+            "option": opt.name,
+            "price": opt.price,
+            "menu_version": catalog.version,
+            "quantity": line.quantity,
+            "subtotal": subtotal
+        })
+    return items, total
+
+def cart_form_data(lines):
+    # Quantities keyed the way order.html names its inputs
+    return {qty_key(l.option_id): l.quantity for l in lines}
+
+def sweep_expired_carts(now=None):
+    cutoff = (now or datetime.now()) - CART_TTL
+    expired = select(Cart.id).where(Cart.updated_at < cutoff)
+    db.session.execute(delete(CartLine).where(CartLine.cart_id.in_(expired)))
+    count = db.session.execute(delete(Cart).where(Cart.updated_at < cutoff)).rowcount
+    db.session.commit()
+    return count
@@ -0,0 +1,191 @@
+import threading
+from collections import namedtuple
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.exc import IntegrityError
+
+from fragment_cache import bump_order_data_version
+from models import db, MenuGroup, MenuItem, MenuOption, Order
+
+CatalogGroup = namedtuple("CatalogGroup", "id name items")
+CatalogItem = namedtuple("CatalogItem", "id group_id name options")
+CatalogOption = namedtuple("CatalogOption", "id item_id item_name name price")
+
+
+class Catalog:
+    """structured_menu.json compiled against the stable ids in the menu_* tables.
+
+    version is the menu version (menu_versions.py) it was compiled from.
+
+    options is a list indexed by option id, so validating a posted option and
+    snapshotting its price is a single bounds-checked index.
+    """
+
+    def __init__(self, groups, version=None):
+        self.version = version
+        self.groups = groups
+        self.items = {}
+        self.option_ids = {}
+
+        all_options = [opt for group in groups for item in group.items for opt in item.options]
+        self.options = [None] * (max((opt.id for opt in all_options), default=0) + 1)
+
+        for group in groups:
+            for item in group.items:
+                self.items[item.id] = item
+                for opt in item.options:
+                    self.options[opt.id] = opt
+                    self.option_ids[(item.name, opt.name)] = opt.id
+
+    def option(self, option_id):
+        if 0 < option_id < len(self.options):
+            return self.options[option_id]
+        return None
+
+    def price(self, option_id):
+        opt = self.option(option_id)
+        return opt.price if opt is not None else None
+
+
+def _sync(menu):
+    groups = {g.name: g for g in MenuGroup.query.all()}
+    items = {(i.group_id, i.name): i for i in MenuItem.query.all()}
+    options = {(o.item_id, o.name): o for o in MenuOption.query.all()}
+    live_groups, live_items, live_options = set(), set(), set()
+
+    compiled = []
+    for group_name, group_items in menu.items():
+        group = groups.get(group_name)
+        if group is None:
+            group = MenuGroup(name=group_name)
+            db.session.add(group)
+            db.session.flush()
+        group.retired = False
+        live_groups.add(group.id)
+
+        compiled_items = []
+        for item_name, item_options in group_items.items():
+            item = items.get((group.id, item_name))
+            if item is None:
+                item = MenuItem(group_id=group.id, name=item_name)
+                db.session.add(item)
+                db.session.flush()
+            item.retired = False
+            live_items.add(item.id)
+
+            compiled_options = []
+            for opt in item_options:
+                option = options.get((item.id, opt["name"]))
+                if option is None:
+                    option = MenuOption(item_id=item.id, name=opt["name"], price=opt["price"])
+                    db.session.add(option)
+                    db.session.flush()
+                option.price = opt["price"]
+                option.retired = False
+                live_options.add(option.id)
+                compiled_options.append(CatalogOption(option.id, item.id, item_name, opt["name"], float(opt["price"])))
+
+            compiled_items.append(CatalogItem(item.id, group.id, item_name, compiled_options))
+        compiled.append(CatalogGroup(group.id, group_name, compiled_items))
+
+    # Keep ids of removed entries around for order history, just flag them
+    for rows, live in ((groups.values(), live_groups),
+                       (items.values(), live_items),
+                       (options.values(), live_options)):
+        for row in rows:
+            if row.id not in live:
+                row.retired = True
+
+    db.session.commit()
+    return compiled
+
+
+def sync_catalog(menu, version=None):
+    """Assign ids to any new groups/items/options in `menu` and compile it."""
+    try:
+        return Catalog(_sync(menu), version)
+    except IntegrityError:
+        # Another worker registered the same new names first; theirs win
+        db.session.rollback()
+        return Catalog(_sync(menu), version)
+
+
+_lock = threading.Lock()
+_cached = (None, None)
+
+def get_catalog(config):
+    """The catalog for the current menu version, recompiled only when the version changes."""
+    global _cached
+    snapshot = config.menu_snapshot()
+    # Version numbers restart per menu_versions directory, so the key names it too
+    key = (config.menu_history.directory, snapshot.version)
+    cached_key, catalog = _cached
+    if catalog is not None and cached_key == key:
+        return catalog
+    with _lock:
+        cached_key, catalog = _cached
+        if catalog is None or cached_key != key:
+            catalog = sync_catalog(snapshot.menu, snapshot.version)
+            _cached = (key, catalog)
+        return catalog
+
+
+def apply_renames(item_renames, option_renames):
+    """Rename catalog rows in place so edits in edit_menu keep their ids.
+
+    item_renames is {item_id: new_name}, option_renames {option_id: new_name}.
+    The changes are only flushed: the caller commits once the new menu is
+    saved, or rolls them back if it isn't.
+    """
+    for item_id, new_name in item_renames.items():
+        item = db.session.get(MenuItem, item_id)
+        if item is None or item.name == new_name:
+            continue
+        _move_aside(MenuItem.query.filter_by(group_id=item.group_id, name=new_name).first(),
+                    MenuItem.name.type.length)
+        item.name = new_name
+        db.session.flush()
+
+    for option_id, new_name in option_renames.items():
+        option = db.session.get(MenuOption, option_id)
+        if option is None or option.name == new_name:
+            continue
+        _move_aside(MenuOption.query.filter_by(item_id=option.item_id, name=new_name).first(),
+                    MenuOption.name.type.length)
+        option.name = new_name
+        db.session.flush()
+
+
+def _move_aside(row, max_length):
+    """Free a name for a rename. The row holding it is retired, removed by the
+    same edit or itself being renamed (a swap); were it left in place, _sync
+    would match the new name to it and the renamed row would lose its id.
+    """
+    if row is None:
+        return
+    suffix = f" [retired #{row.id}]"
+    row.name = row.name[:max_length - len(suffix)] + suffix
+    db.session.flush()
+
+
+def backfill_order_ids(catalog):
+    """Fill item_id/option_id on older Order rows by matching names. Returns rows updated."""
+    params = [
+        {"m_item": opt.item_name, "m_option": opt.name, "v_item_id": opt.item_id, "v_option_id": opt.id}
+        for opt in catalog.options if opt is not None
+    ]
+    if not params:
+        return 0
+
+    stmt = (
+        update(Order.__table__)
+        .where(Order.__table__.c.option_id.is_(None),
+               Order.__table__.c.item_name == bindparam("m_item"),
+               func.coalesce(Order.__table__.c.option, "") == bindparam("m_option"))
+        .values(item_id=bindparam("v_item_id"), option_id=bindparam("v_option_id"))
+    )
+    updated = db.session.execute(stmt, params).rowcount
+    if updated:
+        bump_order_data_version(rewritten=True)
+    db.session.commit()
+    return updated
@@ -0,0 +1,180 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from identity import IdentityIndex
+from menu_versions import MENU_VERSIONS_DIR, MenuHistory, MenuSnapshot, new_file_mode
+from metrics import record_file_read
+
+MENU_FILE = 'structured_menu.json'
+USERS_FILE = 'users.json'
+BUDGET_FILE = 'budgets.json'
+
+# Menu groups whose items go on the weekly Produce & Hyvee shopping list
+PRODUCE_HYVEE_GROUPS = ("Produce", "Hyvee")
+
+
+class CachedJsonFile:
+    """A JSON file parsed once and re-read only when its stat signature changes.
+
+    Derived indexes registered with derive() are cached against the same
+    signature, so they are rebuilt only when the file itself changes.
+    """
+
+    def __init__(self, path, default=None):
+        self.path = path
+        self.default = default
+        self._lock = threading.Lock()
+        self._signature = None
+        self._data = None
+        self._derived = {}
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _load(self, signature):
+        if signature is None:
+            return OrderedDict(self.default or {})
+        record_file_read("json")
+        with open(self.path, 'r') as f:
+            return json.load(f, object_pairs_hook=OrderedDict)
+
+    def get(self):
+        signature = self._stat_signature()
+        if self._data is not None and signature == self._signature:
+            return self._data
+        with self._lock:
+            if self._data is None or signature != self._signature:
+                self._data = self._load(signature)
+                self._signature = signature
+                self._derived = {}
+            return self._data
+
+    @property
+    def version(self):
+        self.get()
+        return self._signature
+
+    def derive(self, name, build):
+        data = self.get()
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        value = build(data)
+        self._derived[name] = (data, value)
+        return value
+
+    def write(self, data):
+        # Write a sibling temp file and rename it over the original so other
+        # workers see either the old file or the new one, never half of it.
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            # Keep the original's permissions; mkstemp creates the temp file owner-only
+            try:
+                mode = os.stat(self.path).st_mode & 0o777
+            except FileNotFoundError:
+                mode = new_file_mode()
+            os.chmod(tmp_path, mode)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def _build_price_lookup(menu):
+    return {
+        f"{item}|||{opt['name']}": opt["price"]
+        for group in menu.values()
+        for item, options in group.items()
+        for opt in options
+    }
+
+
+def _build_produce_hyvee_items(menu):
+    return frozenset(
+        item
+        for group in PRODUCE_HYVEE_GROUPS
+        for item in menu.get(group, {}).keys()
+    )
+
+
+class ConfigStore:
+    """Single access point for the menu, roster and budget JSON files.
+
+    `roster` (an identity.RosterTable) replaces users.json as the roster source.
+    Every saved menu is also kept as a numbered snapshot (see menu_versions.py).
+    """
+
+    def __init__(self, base_dir='.', roster=None):
+        self.menu_file = CachedJsonFile(os.path.join(base_dir, MENU_FILE))
+        self.menu_history = MenuHistory(os.path.join(base_dir, MENU_VERSIONS_DIR))
+        self.users_file = CachedJsonFile(os.path.join(base_dir, USERS_FILE))
+        self.budgets_file = CachedJsonFile(os.path.join(base_dir, BUDGET_FILE), default={})
+        self.roster = roster
+
+    # === Raw documents (shared; callers must not mutate them) ===
+
+    def menu(self):
+        return self.menu_file.get()
+
+    def users(self):
+        if self.roster is not None:
+            return self.roster.users()
+        return self.users_file.get()
+
+    def budgets(self):
+        return self.budgets_file.get()
+
+    # === Derived indexes ===
+
+    def menu_snapshot(self):
+        """The live menu and its version number, both from the same read of the file."""
+        return self.menu_file.derive(
+            'snapshot', lambda menu: MenuSnapshot(self.menu_history.version_of(menu), menu))
+
+    def menu_version(self):
+        return self.menu_snapshot().version
+
+    def price_lookup(self):
+        return self.menu_file.derive('price_lookup', _build_price_lookup)
+
+    def produce_hyvee_items(self):
+        return self.menu_file.derive('produce_hyvee_items', _build_produce_hyvee_items)
+
+    def identity(self):
+        """Case-folded roster lookups (identity.IdentityIndex or the roster table)."""
+        if self.roster is not None:
+            return self.roster
+        return self.users_file.derive('identity', IdentityIndex)
+
+    # === Atomic writes ===
+
+    def save_menu(self, menu, change="edited", saved_by=None, base_version=None):
+        """Record `menu` as a new version, then make it the live menu. Returns the version.
+
+        Raises menu_versions.MenuConflict when base_version is no longer the newest.
+        """
+        version = self.menu_history.save(menu, change, saved_by, base_version)
+        self.menu_file.write(menu)
+        return version
+
+    def save_users(self, users):
+        if self.roster is not None:
+            self.roster.save(users)
+        else:
+            self.users_file.write(users)
+
+    def save_budgets(self, budgets):
+        self.budgets_file.write(budgets)
@@ -0,0 +1,76 @@
+import os
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import Pool, QueuePool
+
+_TRUE = ("1", "true", "yes", "on")
+
+
+def database_url():
+    """DATABASE_URL, with Heroku-style postgres:// rewritten to the scheme SQLAlchemy accepts."""
+    url = os.environ.get("DATABASE_URL")
+    if url and url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def engine_options(url):
+    """SQLALCHEMY_ENGINE_OPTIONS for `url`, tunable through the environment.
+
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT and DB_POOL_RECYCLE (seconds)
+    size each worker's pool; DB_POOL_PRE_PING=0 turns off the liveness check
+    run when a connection is checked out. SQLite keeps its default pool.
+    """
+    options = {"pool_pre_ping": os.environ.get("DB_POOL_PRE_PING", "1").lower() in _TRUE}
+    if url is None or make_url(url).get_backend_name() == "sqlite":
+        return options
+
+    options.update(
+        pool_size=int(os.environ.get("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=int(os.environ.get("DB_POOL_TIMEOUT", "30")),
+        # Recycle before managed Postgres / proxies drop idle connections
+        pool_recycle=int(os.environ.get("DB_POOL_RECYCLE", "1800")),
+    )
+    return options
+
+
+# === Pool statistics ===
+
+_lock = threading.Lock()
+_counts = {"connects": 0, "checkouts": 0, "invalidated": 0}
+
+
+def _count(name):
+    with _lock:
+        _counts[name] += 1
+
+
+@event.listens_for(Pool, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    _count("connects")
+
+
+@event.listens_for(Pool, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    _count("checkouts")
+
+
+@event.listens_for(Pool, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    _count("invalidated")
+
+
+def pool_stats(engine):
+    """Pool occupancy plus connect/checkout counters for this worker process."""
+    pool = engine.pool
+    with _lock:
+        stats = dict(_counts)
+    stats["pool"] = type(pool).__name__
+    if isinstance(pool, QueuePool):
+        stats.update(size=pool.size(), checked_in=pool.checkedin(),
+                     checked_out=pool.checkedout(), overflow=pool.overflow())
+    stats["status"] = pool.status()
+    return stats
@@ -0,0 +1,159 @@
+import csv
+import heapq
+import io
+import os
+import tempfile
+from operator import attrgetter
+
+from sqlalchemy import select
+
+from archive import archived_rows
+from models import db, Order
+from reports import item_label, weekly_team_totals
+from weeks import grid_weeks
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+CSV_MIMETYPE = "text/csv"
+
+# Rows fetched per round trip; Postgres streams them through a server-side cursor
+EXPORT_BATCH_SIZE = 1000
+CHUNK_SIZE = 64 * 1024
+
+
+def stream_rows(stmt, batch_size=EXPORT_BATCH_SIZE):
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def _order_range(stmt, start, end, team):
+    stmt = stmt.where(Order.date >= start, Order.date <= end)
+    if team:
+        stmt = stmt.where(Order.team == team)
+    return stmt
+
+
+def with_archived(stmt, archived, order_by):
+    """Live rows from `stmt` merged with archived rows, both already sorted on `order_by`."""
+    if not archived:
+        return stream_rows(stmt)
+    return heapq.merge(archived, stream_rows(stmt), key=attrgetter(*order_by))
+
+
+def weekly_summary_export(start, end, team=None):
+    """(sheet title, header, row iterator) for every order between start and end."""
+    columns = ("date", "time", "team", "item_name", "option", "quantity")
+    stmt = _order_range(
+        select(*(getattr(Order, c) for c in columns)),
+        start, end, team,
+    ).order_by(Order.date.asc(), Order.time.asc())
+    archived = archived_rows(columns, start, end, team, order_by=("date", "time"))
+
+    rows = (
+        (r.date.strftime("%Y-%m-%d"), r.team, item_label(r.item_name, r.option), r.quantity)
+        for r in with_archived(stmt, archived, ("date", "time"))
+    )
+    return "Weekly Summary", ["Date", "Team", "Item", "Quantity"], rows
+
+
+def produce_hyvee_export(start, end, items, team=None):
+    """(sheet title, header, row iterator) for Produce & Hyvee orders between start and end."""
+    columns = ("date", "team", "item_name", "quantity")
+    stmt = _order_range(
+        select(*(getattr(Order, c) for c in columns)),
+        start, end, team,
+    ).where(Order.item_name.in_(items)).order_by(Order.date.asc(), Order.team.asc())
+    archived = archived_rows(columns, start, end, team, item_names=items, order_by=("date", "team"))
+
+    rows = (
+        (r.date.strftime("%Y-%m-%d"), r.team, r.item_name, r.quantity)
+        for r in with_archived(stmt, archived, ("date", "team"))
+    )
+    return "Produce & Hyvee", ["Date", "Team", "Item", "Quantity"], rows
+
+
+def iter_csv(header, rows, chunk_size=CHUNK_SIZE):
+    """Yield the CSV in chunks as rows arrive, so nothing is held in full."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= chunk_size:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def weekly_totals_export(teams, years=None):
+    """(sheet title, header, rows) of the weekly totals grid: one row per week, one column per team and year."""
+    totals = weekly_team_totals()
+    years = sorted(years or totals.keys())
+    header = ["Week Range", "Week #"] + [f"{team} {year}" for team in teams for year in years]
+    weeks = grid_weeks(years[-1], years) if years else []
+
+    rows = (
+        [w.label, w.number] + [
+            round(totals.get(year, {}).get(w.number, {}).get(team, 0.0), 2)
+            for team in teams for year in years
+        ]
+        for w in weeks
+    )
+    return "Weekly Totals", header, rows
+
+
+def write_csv(path, header, rows):
+    with open(path, "w", newline="") as f:
+        for chunk in iter_csv(header, rows):
+            f.write(chunk)
+
+
+def write_xlsx(path, title, header, rows):
+    # Write-only workbooks spool rows to disk instead of keeping cell objects around
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    ws.append(header)
+    for row in rows:
+        ws.append(list(row))
+    wb.save(path)
+
+
+def build_xlsx_file(title, header, rows):
+    """Write the workbook to a temp file and return its path; the caller removes it."""
+    fd, path = tempfile.mkstemp(prefix="ksu-export-", suffix=".xlsx")
+    os.close(fd)
+    try:
+        write_xlsx(path, title, header, rows)
+    except BaseException:
+        os.unlink(path)
+        raise
+    return path
+
+
+class FileThenRemove:
+    """A response body streaming a temp file in chunks, removed in close().
+
+    The WSGI server calls close() even when the body is never iterated (HEAD
+    requests, a client gone before the first chunk), which a generator's
+    finally block would not see.
+    """
+
+    def __init__(self, path, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+        self._file = None
+
+    def __iter__(self):
+        self._file = open(self.path, "rb")
+        return iter(lambda: self._file.read(self.chunk_size), b"")
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,104 @@
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+from sqlalchemy import select
+
+from models import db, DataVersion
+
+# Rendered fragments kept per worker process before the least recently used is dropped
+FRAGMENT_CACHE_SIZE = 256
+
+
+class FragmentCache:
+    """LRU cache of rendered HTML.
+
+    Keys carry every version the fragment depends on (menu file, order data,
+    roster...), so an edit or a new order simply produces a new key; the stale
+    entry is never asked for again and ages out of the LRU.
+    """
+
+    def __init__(self, maxsize=FRAGMENT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_render(self, key, render):
+        """Cached Markup for `key`, calling render() to build it on a miss."""
+        value = self.get(key)
+        if value is None:
+            # Rendered outside the lock; two workers racing on a miss both render once
+            value = Markup(render())
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def summary(self):
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+fragments = FragmentCache()
+
+
+# data_version rows: "orders" moves on every write to Order, "orders_rewritten"
+# only when existing rows change or go (archiving, backfills), not on appends
+ORDER_VERSIONS = ("orders", "orders_rewritten")
+
+
+def bump_order_data_version(rewritten=False):
+    """Mark Order as changed, in the caller's transaction; nothing is committed here.
+
+    Call it before the transaction's first INSERT into Order: the row lock it
+    takes is held to the commit, so order ids are handed out in commit order
+    and rows after the last id read are exactly the ones added since.
+    """
+    # Imported here: ledger imports archive, which imports this module
+    from ledger import increment_rows
+
+    names = ORDER_VERSIONS if rewritten else ORDER_VERSIONS[:1]
+    increment_rows(DataVersion, ("name",), ("version",), [{"name": name, "version": 1} for name in names])
+
+
+def order_data_version_stmt():
+    return select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(ORDER_VERSIONS))
+
+
+def order_data_version_of(rows):
+    versions = dict(rows)
+    return tuple(versions.get(name, 0) for name in ORDER_VERSIONS)
+
+
+def order_data_version():
+    """(orders, orders_rewritten) counters of Order; a primary key read, however big the table."""
+    return order_data_version_of(db.session.execute(order_data_version_stmt()).all())
@@ -0,0 +1,28 @@
+"""gunicorn settings, picked up automatically by `gunicorn wsgi:app`.
+
+The app is loaded once in the master and forked into the workers, so each
+worker must drop the connections it inherited and open its own pool.
+Run `flask upgrade-db` once per deploy; workers never touch the schema.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", min(2 * multiprocessing.cpu_count() + 1, 8)))
+threads = int(os.environ.get("GUNICORN_THREADS", "1"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "60"))
+# Import the app once in the master: faster worker boot and shared, copy-on-write memory
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1").lower() in ("1", "true", "yes", "on")
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+
+def post_fork(server, worker):
+    # Connections opened in the master (if any) must not be shared with the
+    # children; close=False leaves the parent's sockets alone.
+    from wsgi import app
+    from models import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
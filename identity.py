@@ -0,0 +1,112 @@
+"""Who may log in: the roster compiled into case-folded lookups.
+
+Team and member names match ignoring case and repeated spaces, and every lookup
+is a single hash probe (or, with the roster table, a single unique-index probe)
+however many members the roster has. ConfigStore.identity() hands out the index
+for users.json, rebuilt only when the file changes; with ROSTER_SOURCE=db (env
+KSU_ROSTER_SOURCE) the roster lives in the roster_member table instead, for
+rosters too big to edit as one JSON form.
+"""
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import select
+
+from models import db, RosterMember
+
+# A roster entry with the team and member spelled as the roster spells them
+Identity = namedtuple("Identity", "team member")
+
+# Full admin; every other KSU Football member gets the limited dashboard
+ADMIN = Identity("KSU Football", "Scott Trausch")
+
+
+def name_key(name):
+    return " ".join(name.split()).casefold()
+
+
+class IdentityIndex:
+    """users.json ({team: [members]}) compiled into lookup tables. Never modified once built."""
+
+    def __init__(self, users):
+        self.identities = {}    # (team key, member key) -> Identity
+        self.teams = {}         # team key -> team
+        self.member_teams = {}  # member key -> team; the first team listing a name wins
+        for team, members in users.items():
+            team = team.strip()
+            team_key = name_key(team)
+            self.teams.setdefault(team_key, team)
+            for member in members:
+                member = member.strip()
+                if not member:
+                    continue
+                self.identities.setdefault((team_key, name_key(member)), Identity(team, member))
+                self.member_teams.setdefault(name_key(member), team)
+
+    def resolve(self, team, member):
+        """The roster's Identity for a team and member as typed, or None."""
+        return self.identities.get((name_key(team), name_key(member)))
+
+    def team(self, team):
+        """The roster's spelling of `team`, or None when there is no such team."""
+        return self.teams.get(name_key(team))
+
+    def team_of(self, member):
+        return self.member_teams.get(name_key(member))
+
+
+class RosterTable:
+    """The IdentityIndex lookups, plus reading and replacing the roster, on roster_member."""
+
+    def resolve(self, team, member):
+        if not name_key(member):
+            return None
+        row = db.session.execute(
+            select(RosterMember.team, RosterMember.member)
+            .where(RosterMember.team_key == name_key(team), RosterMember.member_key == name_key(member))
+        ).first()
+        return Identity(*row) if row else None
+
+    def team(self, team):
+        return db.session.execute(
+            select(RosterMember.team).where(RosterMember.team_key == name_key(team)).limit(1)
+        ).scalar()
+
+    def team_of(self, member):
+        if not name_key(member):
+            return None
+        return db.session.execute(
+            select(RosterMember.team).where(RosterMember.member_key == name_key(member))
+            .order_by(RosterMember.position).limit(1)
+        ).scalar()
+
+    def users(self):
+        """The roster as {team: [members]}, in the same shape and order as users.json."""
+        users = OrderedDict()
+        for team, member in db.session.execute(
+            select(RosterMember.team, RosterMember.member).order_by(RosterMember.position)
+        ):
+            members = users.setdefault(team, [])
+            if member:
+                members.append(member)
+        # users.json keeps a team with nobody on it as [" "]
+        return OrderedDict((team, members or [" "]) for team, members in users.items())
+
+    def save(self, users):
+        """Replace the roster with `users` ({team: [members]}) in one transaction."""
+        rows, seen = [], set()
+        for team, members in users.items():
+            team = team.strip()
+            names = [m.strip() for m in members if m.strip()]
+            # An empty member keeps a team with nobody on it listed
+            for member in names or [""]:
+                key = (name_key(team), name_key(member))
+                if key in seen:
+                    continue
+                seen.add(key)
+                rows.append({"team": team, "member": member, "team_key": key[0], "member_key": key[1],
+                             "position": len(rows)})
+        db.session.execute(RosterMember.__table__.delete())
+        if rows:
+            db.session.execute(RosterMember.__table__.insert(), rows)
+        db.session.commit()
+        return len(rows)
@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import delete, or_, select, update
+
+from exports import (CSV_MIMETYPE, XLSX_MIMETYPE, produce_hyvee_export, weekly_summary_export,
+                     weekly_totals_export, write_csv, write_xlsx)
+from models import db, Job
+
+logger = logging.getLogger("ksu.jobs")
+
+# Finished artifacts (and their job rows) are kept this long
+JOB_TTL = timedelta(hours=24)
+# A job still "running" after this long belongs to a worker that died
+JOB_TIMEOUT = timedelta(hours=1)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+# === Job kinds ===
+# Each builds (sheet title, header, rows) from the job's params; the runner writes it out.
+
+def _date_range(params):
+    return date.fromisoformat(params["start"]), date.fromisoformat(params["end"])
+
+def _weekly_summary(params, config):
+    start, end = _date_range(params)
+    return weekly_summary_export(start, end, params.get("team"))
+
+def _produce_hyvee(params, config):
+    start, end = _date_range(params)
+    return produce_hyvee_export(start, end, config.produce_hyvee_items(), params.get("team"))
+
+def _weekly_totals(params, config):
+    return weekly_totals_export(list(config.users().keys()))
+
+JOB_KINDS = {
+    "weekly_summary": ("Full_Weekly_Orders", _weekly_summary),
+    "produce_hyvee": ("Produce_Hyvee_Orders", _produce_hyvee),
+    "weekly_totals": ("Weekly_Totals", _weekly_totals),
+}
+
+
+# === Runner ===
+
+class JobRunner:
+    """Runs jobs on a small in-process thread pool so request workers never build exports.
+
+    The job table is the queue's state, not a broker: each worker process runs
+    the jobs it enqueued, and any process can report on or serve any job.
+    """
+
+    def __init__(self, app, config, job_dir, workers):
+        self.app = app
+        self.config = config
+        self.job_dir = job_dir
+        self.workers = workers
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        # Created on first use, and again after a fork, so gunicorn workers get their own threads
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ksu-job")
+                self._pid = os.getpid()
+            return self._executor
+
+    def artifact_path(self, job):
+        return os.path.join(self.job_dir, job.id)
+
+    def enqueue(self, kind, params, owner=None):
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        job = Job(id=uuid.uuid4().hex, kind=kind, params=json.dumps(params), owner=owner,
+                  status=QUEUED, created_at=datetime.now())
+        db.session.add(job)
+        db.session.commit()
+        self._pool().submit(self._run, job.id)
+        return job
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            claimed = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, started_at=datetime.now())
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(Job, job_id)
+            prefix, build = JOB_KINDS[job.kind]
+            params = json.loads(job.params)
+            fmt = "csv" if params.get("format") == "csv" else "xlsx"
+            path = self.artifact_path(job)
+            try:
+                os.makedirs(self.job_dir, exist_ok=True)
+                title, header, rows = build(params, self.config)
+                if fmt == "csv":
+                    write_csv(path, header, rows)
+                else:
+                    write_xlsx(path, title, header, rows)
+                result = {"status": DONE, "filename": _filename(prefix, params, fmt),
+                          "mimetype": CSV_MIMETYPE if fmt == "csv" else XLSX_MIMETYPE}
+            except Exception as e:
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                db.session.rollback()
+                result = {"status": FAILED, "error": str(e)}
+
+            # Only while still ours: sweep() may have timed the job out in the meantime
+            finished = db.session.execute(
+                update(Job).where(Job.id == job_id, Job.status == RUNNING)
+                .values(finished_at=datetime.now(), **result)
+            ).rowcount
+            db.session.commit()
+            if (result["status"] == FAILED or not finished) and os.path.exists(path):
+                os.unlink(path)
+
+    def sweep(self, now=None):
+        """Fail jobs orphaned by a dead worker, then drop expired jobs and their files.
+
+        Returns the number of jobs removed.
+        """
+        now = now or datetime.now()
+        # A running job's time counts from when it started, not from how long it queued
+        db.session.execute(
+            update(Job).where(or_(
+                (Job.status == QUEUED) & (Job.created_at < now - JOB_TIMEOUT),
+                (Job.status == RUNNING) & (Job.started_at < now - JOB_TIMEOUT),
+            )).values(status=FAILED, error="Timed out", finished_at=now)
+        )
+        expired = db.session.execute(
+            select(Job).where(or_(Job.finished_at < now - JOB_TTL,
+                                  Job.created_at < now - JOB_TTL - JOB_TIMEOUT))
+        ).scalars().all()
+        for job in expired:
+            path = self.artifact_path(job)
+            if os.path.exists(path):
+                os.unlink(path)
+        if expired:
+            db.session.execute(delete(Job).where(Job.id.in_([job.id for job in expired])))
+        db.session.commit()
+        return len(expired)
+
+
+def _filename(prefix, params, fmt):
+    name = prefix
+    if params.get("start"):
+        name += "_" + params["start"].replace("-", "")
+    if params.get("end") and params.get("end") != params.get("start"):
+        name += "_" + params["end"].replace("-", "")
+    if params.get("team"):
+        name += "_" + params["team"].replace(" ", "_")
+    return f"{name}.{fmt}"
+
+
+def init_jobs(app, config):
+    """Attach a JobRunner to `app` (JOB_DIR / JOB_WORKERS, env KSU_JOB_DIR / KSU_JOB_WORKERS)."""
+    app.config.setdefault("JOB_DIR", os.environ.get("KSU_JOB_DIR", "job_cache"))
+    app.config.setdefault("JOB_WORKERS", int(os.environ.get("KSU_JOB_WORKERS", "2")))
+    runner = JobRunner(app, config, os.path.abspath(app.config["JOB_DIR"]), app.config["JOB_WORKERS"])
+    app.extensions["ksu_jobs"] = runner
+    return runner
+
+
+def job_status(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "params": json.loads(job.params),
+        "status": job.status,
+        "created_at": job.created_at.isoformat(timespec="seconds"),
+        "finished_at": job.finished_at.isoformat(timespec="seconds") if job.finished_at else None,
+        "filename": job.filename,
+        "error": job.error,
+    }
@@ -0,0 +1,220 @@
+import importlib
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from archive import archived_groups
+from fragment_cache import bump_order_data_version
+from models import db, Order, TeamSpend, WeeklyRollup
+from weeks import week_index_of, week_start, week_start_from_index
+
+# Dialects whose INSERT supports ON CONFLICT ... DO UPDATE. Looked up by name
+# so only the dialect actually in use gets imported (postgresql alone is ~50ms).
+_UPSERT_DIALECTS = ('postgresql', 'sqlite')
+
+def budget_period(day):
+    # Budgets run per calendar year, same as the old "Yearly Orders" sheets
+    return str(day.year)
+
+def increment_rows(model, key_cols, value_cols, rows):
+    """Add each row's value_cols onto the matching model row, creating it if missing.
+
+    Runs inside the caller's transaction; nothing is committed here.
+    """
+    if not rows:
+        return
+
+    table = model.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in _UPSERT_DIALECTS:
+        stmt = importlib.import_module(f"sqlalchemy.dialects.{dialect}").insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[k] for k in key_cols],
+            set_={v: table.c[v] + stmt.excluded[v] for v in value_cols},
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    # Generic fallback: try the update first, insert when no row matched
+    for row in rows:
+        stmt = update(table).where(*[table.c[k] == row[k] for k in key_cols]).values(
+            {v: table.c[v] + row[v] for v in value_cols}
+        )
+        if db.session.execute(stmt).rowcount == 0:
+            db.session.execute(table.insert().values(**row))
+
+# Float totals are compared to the budget to within half a cent
+BUDGET_TOLERANCE = 0.005
+
+class BudgetExceeded(Exception):
+    """An order that would take its team past the budget for the period."""
+
+    def __init__(self, team, amount, remaining):
+        super().__init__(f"Order total ${amount:.2f} is more than the ${remaining:.2f} left in {team}'s budget")
+        self.team = team
+        self.amount = amount
+        self.remaining = remaining
+
+def order_amount(items):
+    return sum(float(item["price"]) * int(item["quantity"]) for item in items)
+
+def record_order_spend(team_name, order_date, items):
+    # Unchecked; bulk imports and rebuilds. Web submits go through reserve_team_spend
+    increment_rows(TeamSpend, ("team", "period"), ("total_spent",), [{
+        "team": team_name,
+        "period": budget_period(order_date),
+        "total_spent": order_amount(items),
+    }])
+
+def reserve_team_spend(team_name, order_date, items, budget):
+    """Add the order to the team's ledger row only if the total stays within `budget`.
+
+    The check and the increment are one conditional UPDATE, so it cannot race:
+    the row stays locked until the caller commits, later submits for the same
+    team wait and then see the new total, and other teams never wait at all.
+    Raises BudgetExceeded (with the ledger untouched) when the order doesn't fit.
+    """
+    amount = order_amount(items)
+    period = budget_period(order_date)
+    table = TeamSpend.__table__
+
+    def add_within_budget():
+        return db.session.execute(
+            update(table)
+            .where(table.c.team == team_name, table.c.period == period,
+                   table.c.total_spent + amount <= budget + BUDGET_TOLERANCE)
+            .values(total_spent=table.c.total_spent + amount)
+        ).rowcount
+
+    if add_within_budget():
+        return amount
+
+    if get_team_spent(team_name, period) == 0.0:
+        # Possibly the team's first order of the period: create its row, then retry.
+        # A concurrent first submit may create it too; the savepoint absorbs that.
+        try:
+            with db.session.begin_nested():
+                db.session.execute(table.insert().values(team=team_name, period=period, total_spent=0.0))
+        except IntegrityError:
+            pass
+        if add_within_budget():
+            return amount
+
+    raise BudgetExceeded(team_name, amount, budget - get_team_spent(team_name, period))
+
+def record_order_rollup(team_name, member_name, order_date, items):
+    start = week_start(order_date)
+    lines = {}
+    for item in items:
+        key = (item["name"], item.get("option") or "")
+        qty, spend = lines.get(key, (0, 0.0))
+        lines[key] = (qty + int(item["quantity"]),
+                      spend + float(item["price"]) * int(item["quantity"]))
+
+    increment_rows(
+        WeeklyRollup,
+        ("week_start", "team", "member", "item_name", "option"),
+        ("quantity", "spend"),
+        [{
+            "week_start": start,
+            "team": team_name,
+            "member": member_name,
+            "item_name": item_name,
+            "option": option,
+            "quantity": qty,
+            "spend": spend,
+        } for (item_name, option), (qty, spend) in lines.items()],
+    )
+
+def get_team_spent(team_name, period):
+    spent = db.session.execute(
+        select(TeamSpend.total_spent).where(
+            TeamSpend.team == team_name,
+            TeamSpend.period == period,
+        )
+    ).scalar()
+    return spent or 0.0
+
+def rebuild_ledger():
+    """Recompute every TeamSpend row from the Order table and the archived seasons.
+
+    Returns {(team, period): (old_total, new_total)} for rows that changed.
+    """
+    old = {
+        (row.team, row.period): row.total_spent
+        for row in TeamSpend.query.all()
+    }
+
+    # Group by day in SQL, then fold days into periods so budget_period stays the only rule
+    daily = db.session.execute(
+        select(Order.team, Order.date, func.sum(Order.price * Order.quantity))
+        .group_by(Order.team, Order.date)
+    ).all()
+
+    daily += [(r.team, r.date, r.spend_sum) for r in archived_groups(("team", "date"))]
+
+    new = {}
+    for team, day, spent in daily:
+        key = (team, budget_period(day))
+        new[key] = new.get(key, 0.0) + (spent or 0.0)
+
+    db.session.execute(TeamSpend.__table__.delete())
+    if new:
+        db.session.execute(TeamSpend.__table__.insert(), [
+            {"team": team, "period": period, "total_spent": total}
+            for (team, period), total in new.items()
+        ])
+    db.session.commit()
+
+    changes = {}
+    for key in old.keys() | new.keys():
+        before, after = old.get(key, 0.0), new.get(key, 0.0)
+        if abs(before - after) > 0.005:
+            changes[key] = (before, after)
+    return changes
+
+def backfill_order_weeks():
+    """Set week_id on Order rows that predate the column. Returns rows updated."""
+    updated = db.session.execute(
+        update(Order.__table__)
+        .where(Order.__table__.c.week_id.is_(None))
+        .values(week_id=week_index_of(Order.__table__.c.date))
+    ).rowcount
+    if updated:
+        bump_order_data_version(rewritten=True)
+    db.session.commit()
+    return updated
+
+def rebuild_rollups():
+    """Recompute the weekly_rollup table from the Order table and the archived seasons. Returns the row count."""
+    backfill_order_weeks()
+    week = Order.week_id
+    option = func.coalesce(Order.option, '')
+    grouped = db.session.execute(
+        select(week, Order.team, Order.member, Order.item_name, option,
+               func.sum(Order.quantity), func.sum(Order.price * Order.quantity))
+        .group_by(week, Order.team, Order.member, Order.item_name, option)
+    ).all()
+
+    # A week that straddles New Year can be split between an archived season and Order
+    sums = {}
+    archived = archived_groups(("week_id", "team", "member", "item_name", "option"))
+    for *key, qty, spend in [*grouped, *archived]:
+        entry = sums.setdefault(tuple(key), [0, 0.0])
+        entry[0] += int(qty or 0)
+        entry[1] += spend or 0.0
+
+    db.session.execute(WeeklyRollup.__table__.delete())
+    if sums:
+        db.session.execute(WeeklyRollup.__table__.insert(), [{
+            "week_start": week_start_from_index(index),
+            "team": team,
+            "member": member,
+            "item_name": item_name,
+            "option": opt,
+            "quantity": qty,
+            "spend": spend,
+        } for (index, team, member, item_name, opt), (qty, spend) in sums.items()])
+    db.session.commit()
+    return len(sums)
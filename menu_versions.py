@@ -0,0 +1,230 @@
+"""Numbered, immutable snapshots of structured_menu.json, and small edits to them.
+
+Every menu saved through the app becomes menu_versions/<version>.json, holding
+the menu, its content digest, who saved it and what changed. The version is an
+increasing integer, so caches and the catalog compare one int to know the menu
+changed, and each Order row records the version its price came from.
+
+structured_menu.json stays the live menu and can still be edited by hand: a
+menu that matches no snapshot is recorded as the next version the first time
+it is read.
+"""
+import copy
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+MENU_VERSIONS_DIR = 'menu_versions'
+_VERSION_FILE_RE = re.compile(r"^(\d{6,})\.json$")
+
+MenuSnapshot = namedtuple("MenuSnapshot", "version menu")
+
+
+class MenuConflict(Exception):
+    """The menu was saved by someone else since the version an edit started from."""
+
+    def __init__(self, current):
+        self.current = current
+        super().__init__(f"The menu was changed by someone else (now version {current}); reload and try again.")
+
+
+class MenuPatchError(ValueError):
+    pass
+
+
+def new_file_mode():
+    """Permissions a plain open() would give a new file (mkstemp's are owner-only)."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+
+def menu_digest(menu):
+    return hashlib.sha256(json.dumps(menu, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class MenuHistory:
+    """The menu_versions directory. Snapshots are never modified once written."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._digests = {}
+
+    def _path(self, version):
+        return os.path.join(self.directory, f"{version:06d}.json")
+
+    def versions(self):
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(int(match.group(1)) for name in names if (match := _VERSION_FILE_RE.match(name)))
+
+    def latest(self):
+        versions = self.versions()
+        return versions[-1] if versions else 0
+
+    def record(self, version):
+        with open(self._path(version), 'r') as f:
+            return json.load(f, object_pairs_hook=OrderedDict)
+
+    def digest(self, version):
+        digest = self._digests.get(version)
+        if digest is None:
+            digest = self._digests[version] = self.record(version)["digest"]
+        return digest
+
+    def version_of(self, menu):
+        """The newest version holding exactly `menu`, recorded as a new version if there is none."""
+        digest = menu_digest(menu)
+        with self._lock:
+            while True:
+                versions = self.versions()
+                for version in reversed(versions):
+                    if self.digest(version) == digest:
+                        return version
+                try:
+                    return self._write(versions[-1] + 1 if versions else 1, menu, digest,
+                                       "recorded from structured_menu.json")
+                except MenuConflict:
+                    # Another worker recorded a version first; look again
+                    continue
+
+    def save(self, menu, change, saved_by=None, base_version=None):
+        """Record `menu` as the next version and return its number.
+
+        base_version is the version the edit started from; MenuConflict is
+        raised when a newer one exists. Saving an unchanged menu records nothing.
+        """
+        digest = menu_digest(menu)
+        with self._lock:
+            latest = self.latest()
+            if base_version is not None and base_version != latest:
+                raise MenuConflict(latest)
+            if latest and self.digest(latest) == digest:
+                return latest
+            return self._write(latest + 1, menu, digest, change, saved_by)
+
+    def _write(self, version, menu, digest, change, saved_by=None):
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.json')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump({
+                    "version": version,
+                    "digest": digest,
+                    "saved_at": datetime.now().isoformat(timespec="seconds"),
+                    "saved_by": saved_by,
+                    "change": change,
+                    "menu": menu,
+                }, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp_path, new_file_mode())
+            # link() refuses to replace an existing file, so two writers can't both take a number
+            try:
+                os.link(tmp_path, self._path(version))
+            except FileExistsError:
+                raise MenuConflict(version)
+        finally:
+            os.unlink(tmp_path)
+        self._digests[version] = digest
+        return version
+
+
+# === Patches ===
+
+def menu_price(value):
+    """A menu price from a form or patch: finite and non-negative, to the cent."""
+    try:
+        price = round(float(value), 2)
+    except (TypeError, ValueError):
+        raise MenuPatchError(f"Invalid price {value!r}")
+    # float() also takes "nan" and "inf", which the catalog can't store
+    if not math.isfinite(price) or price < 0:
+        raise MenuPatchError(f"Invalid price {value!r}")
+    return price
+
+
+def _name(op, key):
+    name = str(op.get(key) or "").strip()
+    if not name:
+        raise MenuPatchError(f"'{op.get('op')}' needs a {key}")
+    return name
+
+
+def apply_menu_patch(menu, ops, catalog):
+    """Apply add/update/remove option edits to a copy of `menu`.
+
+    ops is a list of {"op": "add", "group", "item", "option", "price"},
+    {"op": "update", "option_id", "name" and/or "price"} and
+    {"op": "remove", "option_id"}, where option_id is a catalog id of the
+    menu's version. Returns (new menu, {option_id: new name} for renames,
+    a one-line description). Raises MenuPatchError on an invalid edit.
+    """
+    menu = copy.deepcopy(menu)
+    group_names = {group.id: group.name for group in catalog.groups}
+    renames, done = {}, []
+    # option_id -> its name in the working menu once an op renamed it (None once removed)
+    names = {}
+
+    def find(op):
+        try:
+            opt = catalog.option(int(op.get("option_id")))
+        except (TypeError, ValueError):
+            opt = None
+        if opt is None:
+            raise MenuPatchError(f"Unknown option id {op.get('option_id')!r}")
+        options = menu.get(group_names[catalog.items[opt.item_id].group_id], {}).get(opt.item_name, [])
+        name = names.get(opt.id, opt.name)
+        for entry in options:
+            if name is not None and entry["name"] == name:
+                return opt, options, entry
+        raise MenuPatchError(f"Option {opt.item_name} - {opt.name} was already removed")
+
+    for op in ops:
+        kind = op.get("op") if isinstance(op, dict) else None
+        if kind == "add":
+            group, item, option = _name(op, "group"), _name(op, "item"), _name(op, "option")
+            price = menu_price(op.get("price"))
+            options = menu.setdefault(group, OrderedDict()).setdefault(item, [])
+            if any(entry["name"] == option for entry in options):
+                raise MenuPatchError(f"{item} already has an option {option!r}")
+            options.append({"name": option, "price": price})
+            done.append(f"added {item} - {option} ${price:.2f}")
+        elif kind == "update":
+            opt, options, entry = find(op)
+            if "name" in op:
+                name = _name(op, "name")
+                if name != entry["name"]:
+                    if any(other["name"] == name for other in options):
+                        raise MenuPatchError(f"{opt.item_name} already has an option {name!r}")
+                    done.append(f"renamed {opt.item_name} - {entry['name']} to {name}")
+                    entry["name"] = names[opt.id] = renames[opt.id] = name
+            if "price" in op:
+                price = menu_price(op["price"])
+                if price != entry["price"]:
+                    entry["price"] = price
+                    done.append(f"{opt.item_name} - {entry['name']} now ${price:.2f}")
+        elif kind == "remove":
+            opt, options, entry = find(op)
+            options.remove(entry)
+            names[opt.id] = None
+            done.append(f"removed {opt.item_name} - {entry['name']}")
+        else:
+            raise MenuPatchError(f"Unknown edit {op!r}")
+
+    # An item without options, or a group without items, is not shown; drop it like the menu page does
+    for group in list(menu):
+        for item in [item for item, options in menu[group].items() if not options]:
+            del menu[group][item]
+        if not menu[group]:
+            del menu[group]
+    return menu, renames, "; ".join(done)
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from flask import before_render_template, g, has_request_context, request, session, template_rendered
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("ksu.metrics")
+
+# Request durations kept per endpoint (per worker process) for the percentiles
+SAMPLES_PER_ENDPOINT = 2000
+
+_TRUE = ("1", "true", "yes", "on")
+
+
+def percentile(sorted_samples, pct):
+    if not sorted_samples:
+        return 0.0
+    k = (len(sorted_samples) - 1) * pct / 100.0
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+class EndpointStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._counts = {}
+
+    def record(self, endpoint, duration_ms):
+        with self._lock:
+            samples = self._samples.get(endpoint)
+            if samples is None:
+                samples = self._samples[endpoint] = deque(maxlen=SAMPLES_PER_ENDPOINT)
+            samples.append(duration_ms)
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        with self._lock:
+            snapshot = {name: sorted(samples) for name, samples in self._samples.items()}
+            counts = dict(self._counts)
+        rows = []
+        for endpoint, samples in snapshot.items():
+            rows.append({
+                "endpoint": endpoint,
+                "count": counts[endpoint],
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "max": samples[-1] if samples else 0.0,
+            })
+        rows.sort(key=lambda r: r["p95"], reverse=True)
+        return rows
+
+
+stats = EndpointStats()
+
+
+def _current():
+    if has_request_context():
+        return g.get("_metrics")
+    return None
+
+
+def record_file_read(kind):
+    """Count a JSON/Excel file read against the current request (no-op when disabled)."""
+    current = _current()
+    if current is not None:
+        current["file_reads"][kind] = current["file_reads"].get(kind, 0) + 1
+
+
+# === SQLAlchemy hooks: statement count and time spent in the database ===
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    if current is not None:
+        conn.info.setdefault("_metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = _current()
+    started = conn.info.get("_metrics_started")
+    if current is not None and started:
+        current["sql_count"] += 1
+        current["sql_ms"] += (time.perf_counter() - started.pop()) * 1000.0
+
+
+# === Template hooks: render time ===
+
+def _before_render(sender, template, context, **extra):
+    current = _current()
+    if current is not None:
+        current["_template_started"] = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    current = _current()
+    if current is not None and "_template_started" in current:
+        current["template_ms"] += (time.perf_counter() - current.pop("_template_started")) * 1000.0
+
+
+# === Profiling a single request ===
+
+def _start_profile():
+    try:
+        from pyinstrument import Profiler
+    except ImportError:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return ("cprofile", profiler)
+    profiler = Profiler()
+    profiler.start()
+    return ("pyinstrument", profiler)
+
+
+def _profile_report(kind, profiler):
+    if kind == "pyinstrument":
+        profiler.stop()
+        return profiler.output_html(), "text/html"
+
+    import io
+    import pstats
+    profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(60)
+    return out.getvalue(), "text/plain"
+
+
+def _server_timing(current, total_ms):
+    parts = [
+        f"app;dur={total_ms:.1f}",
+        f'db;dur={current["sql_ms"]:.1f};desc="{current["sql_count"]} queries"',
+        f"tpl;dur={current['template_ms']:.1f}",
+    ]
+    reads = sum(current["file_reads"].values())
+    if reads:
+        parts.append(f'files;desc="{reads} reads"')
+    return ", ".join(parts)
+
+
+def init_instrumentation(app):
+    """Register per-request timing on `app` when METRICS_ENABLED (env KSU_METRICS) is on.
+
+    Each request gets a Server-Timing header and one JSON log line on the
+    ksu.metrics logger; durations feed the /admin/metrics percentiles. With
+    PROFILING_ENABLED (env KSU_PROFILE) an admin can add ?_profile=1 to any URL
+    to get a profile of that one request instead of the page.
+    """
+    app.config.setdefault("METRICS_ENABLED", os.environ.get("KSU_METRICS", "").lower() in _TRUE)
+    app.config.setdefault("PROFILING_ENABLED", os.environ.get("KSU_PROFILE", "").lower() in _TRUE)
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_request_metrics():
+        g._metrics = {
+            "started": time.perf_counter(),
+            "sql_count": 0,
+            "sql_ms": 0.0,
+            "template_ms": 0.0,
+            "file_reads": {},
+        }
+        if app.config["PROFILING_ENABLED"] and request.args.get("_profile") == "1":
+            if current_user.is_authenticated and (current_user.id == "admin" or session.get("admin_as_football")):
+                g._profiler = _start_profile()
+
+    @app.after_request
+    def _finish_request_metrics(response):
+        current = g.pop("_metrics", None)
+        if current is None:
+            return response
+
+        total_ms = (time.perf_counter() - current["started"]) * 1000.0
+        endpoint = request.endpoint or "<unmatched>"
+        stats.record(endpoint, total_ms)
+
+        response.headers["Server-Timing"] = _server_timing(current, total_ms)
+        logger.info(json.dumps({
+            "endpoint": endpoint,
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "ms": round(total_ms, 2),
+            "sql_count": current["sql_count"],
+            "sql_ms": round(current["sql_ms"], 2),
+            "template_ms": round(current["template_ms"], 2),
+            "file_reads": current["file_reads"],
+        }))
+
+        profiler = g.pop("_profiler", None)
+        if profiler is not None:
+            body, mimetype = _profile_report(*profiler)
+            return app.response_class(body, mimetype=mimetype)
+        return response
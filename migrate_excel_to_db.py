@@ -1,48 +1,238 @@
+"""Import legacy user_orders/*.xlsx "Yearly Orders" sheets into the Order table.
+
+    python migrate_excel_to_db.py [files or directories ...] [--batch-size 2000]
+                                  [--workers 4] [--copy] [--dry-run] [--rejects rejects.csv]
+
+Safe to re-run: rows already in the database (same team, member, date, time,
+item and option) are skipped. Prices come from structured_menu.json; rows whose
+item/option is not on the menu are rejected and reported.
+"""
+import argparse
+import csv
+import io
 import os
-from openpyxl import load_workbook
-from models import db, Order
-from app import app
-from datetime import datetime
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime
+
+from weeks import week_index
 
 EXCEL_DIR = "user_orders"
+SHEET_NAME = "Yearly Orders"
 
-with app.app_context():
-    files = [f for f in os.listdir(EXCEL_DIR) if f.endswith('.xlsx')]
+ORDER_COLUMNS = ("team", "member", "date", "time", "week_id", "item_name", "option", "quantity", "price")
 
-    for file in files:
-        filepath = os.path.join(EXCEL_DIR, file)
-        wb = load_workbook(filepath)
-        
-        if "Yearly Orders" not in wb.sheetnames:
-            continue
-        
-        ws = wb["Yearly Orders"]
 
-        # Skip header row
-        for row in ws.iter_rows(min_row=2, values_only=True):
-            date_str, time_str, member, item_name, option, quantity = row
+def natural_key(row):
+    return (row["team"], row["member"], row["date"], row["time"], row["item_name"], row["option"])
+
+
+def team_from_filename(filename):
+    # Legacy files are named orders_<team>.xlsx
+    return os.path.basename(filename).replace("orders_", "").replace(".xlsx", "").strip()
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip(), "%Y-%m-%d").date()
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value.time()
+    if hasattr(value, "hour"):
+        return value
+    return datetime.strptime(str(value).strip(), "%H:%M:%S").time()
+
+
+def parse_workbook(filepath, price_lookup):
+    """Stream one workbook's rows. Returns (filepath, rows, rejects).
 
+    Runs in a worker process, so it only touches the file and the price map.
+    """
+    from openpyxl import load_workbook
+
+    rows, rejects = [], []
+    team = team_from_filename(filepath)
+
+    wb = load_workbook(filepath, read_only=True, data_only=True)
+    try:
+        if SHEET_NAME not in wb.sheetnames:
+            return filepath, rows, rejects
+
+        # Skip header row
+        for line_no, values in enumerate(wb[SHEET_NAME].iter_rows(min_row=2, values_only=True), start=2):
+            if not values or all(v is None for v in values):
+                continue
             try:
-                order_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-                order_time = datetime.strptime(time_str, "%H:%M:%S").time()
+                date_value, time_value, member, item_name, option, quantity = values[:6]
+                option = (option or "").strip()
+                item_name = (item_name or "").strip()
+                price = price_lookup.get(f"{item_name}|||{option}")
+                if price is None:
+                    raise ValueError(f"'{item_name}' / '{option}' is not on the menu")
+                order_date = _parse_date(date_value)
+                rows.append({
+                    "team": team,
+                    "member": str(member).strip(),
+                    "date": order_date,
+                    "time": _parse_time(time_value),
+                    "week_id": week_index(order_date),
+                    "item_name": item_name,
+                    "option": option,
+                    "quantity": int(quantity),
+                    "price": float(price),
+                })
             except Exception as e:
-                print(f"Skipping row due to bad date/time: {row} ({e})")
-                continue
+                rejects.append((filepath, line_no, str(e), values))
+    finally:
+        wb.close()
+
+    return filepath, rows, rejects
+
+
+def existing_keys(db, Order, batch):
+    """Natural keys from `batch` that are already stored."""
+    teams = {r["team"] for r in batch}
+    members = {r["member"] for r in batch}
+    first = min(r["date"] for r in batch)
+    last = max(r["date"] for r in batch)
+
+    stored = db.session.execute(
+        db.select(Order.team, Order.member, Order.date, Order.time, Order.item_name, Order.option)
+        .where(Order.team.in_(teams), Order.member.in_(members),
+               Order.date >= first, Order.date <= last)
+    ).all()
+    return {(t, m, d, tm, i, o or "") for t, m, d, tm, i, o in stored}
 
-            # Guess team from filename
-            team = file.replace("orders_", "").replace(".xlsx", "").strip()
-
-            order = Order(
-                team=team,
-                member=member,
-                date=order_date,
-                time=order_time,
-                item_name=item_name,
-                option=option,
-                quantity=int(quantity)
-            )
 
-            db.session.add(order)
+def copy_rows(db, Order, batch):
+    # Postgres COPY: one round trip, no per-row statement overhead
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for r in batch:
+        writer.writerow([r[c] for c in ORDER_COLUMNS])
+    buffer.seek(0)
 
+    table = Order.__table__.name
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f'COPY "{table}" ({", ".join(ORDER_COLUMNS)}) FROM STDIN WITH (FORMAT csv)',
+        buffer,
+    )
+
+
+def insert_batch(db, Order, batch, use_copy):
+    from fragment_cache import bump_order_data_version
+
+    bump_order_data_version()
+    if use_copy and db.engine.dialect.name == "postgresql":
+        copy_rows(db, Order, batch)
+    else:
+        db.session.execute(db.insert(Order), batch)
     db.session.commit()
-    print("✅ Migration complete.")
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, f) for f in sorted(os.listdir(path))
+                if f.endswith(".xlsx") and not f.startswith("~$")
+            )
+        elif path.endswith(".xlsx"):
+            files.append(path)
+    return files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy order workbooks into the database.")
+    parser.add_argument("paths", nargs="*", default=[EXCEL_DIR],
+                        help="workbooks or directories of workbooks (default: user_orders/)")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="processes used to parse workbooks")
+    parser.add_argument("--copy", action="store_true", help="use COPY on Postgres")
+    parser.add_argument("--dry-run", action="store_true", help="parse and dedupe, insert nothing")
+    parser.add_argument("--rejects", help="write rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    from app import create_app
+    from models import db, Order
+    from catalog import backfill_order_ids, get_catalog
+    from ledger import rebuild_ledger, rebuild_rollups
+    from schema import upgrade_schema
+
+    files = collect_files(args.paths)
+    if not files:
+        print("No workbooks found.")
+        return
+
+    app = create_app()
+    price_lookup = dict(app.extensions["ksu_config"].price_lookup())
+    started = time.perf_counter()
+    totals = {"read": 0, "inserted": 0, "duplicates": 0, "rejected": 0}
+    all_rejects = []
+
+    with app.app_context(), ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        upgrade_schema()
+        futures = [pool.submit(parse_workbook, f, price_lookup) for f in files]
+
+        for future in as_completed(futures):
+            filepath, rows, rejects = future.result()
+            totals["read"] += len(rows) + len(rejects)
+            totals["rejected"] += len(rejects)
+            all_rejects.extend(rejects)
+            inserted = 0
+
+            seen = set()
+            for i in range(0, len(rows), args.batch_size):
+                batch = rows[i:i + args.batch_size]
+                stored = existing_keys(db, Order, batch)
+                fresh = []
+                for row in batch:
+                    key = natural_key(row)
+                    if key in stored or key in seen:
+                        totals["duplicates"] += 1
+                        continue
+                    seen.add(key)
+                    fresh.append(row)
+
+                if fresh and not args.dry_run:
+                    insert_batch(db, Order, fresh, args.copy)
+                inserted += len(fresh)
+
+            totals["inserted"] += inserted
+            print(f"{os.path.basename(filepath)}: {len(rows)} rows, {inserted} new, {len(rejects)} rejected")
+
+        if totals["inserted"] and not args.dry_run:
+            # Bulk inserts bypass save_user_order, so link catalog ids and bring the aggregates back in line
+            backfill_order_ids(get_catalog(app.extensions["ksu_config"]))
+            rebuild_ledger()
+            rebuild_rollups()
+
+    elapsed = time.perf_counter() - started
+    rate = totals["read"] / elapsed if elapsed else 0.0
+    print(f"✅ Migration complete in {elapsed:.1f}s ({rate:,.0f} rows/sec): "
+          f"{totals['inserted']} inserted, {totals['duplicates']} duplicates skipped, "
+          f"{totals['rejected']} rejected" + (" [dry run]" if args.dry_run else ""))
+
+    for filepath, line_no, reason, _ in all_rejects[:20]:
+        print(f"  rejected {os.path.basename(filepath)}:{line_no}: {reason}")
+    if len(all_rejects) > 20:
+        print(f"  ... {len(all_rejects) - 20} more")
+
+    if args.rejects and all_rejects:
+        with open(args.rejects, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "row", "reason", "values"])
+            for filepath, line_no, reason, values in all_rejects:
+                writer.writerow([filepath, line_no, reason, values])
+
+
+if __name__ == "__main__":
+    main()
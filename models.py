@@ -3,6 +3,16 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 class Order(db.Model):
+    # Composite indexes matching the admin views' filters (weekly ranges by date,
+    # per-team weeks, per-member history, Produce/Hyvee item lookups, week filters)
+    __table_args__ = (
+        db.Index('ix_order_date_time', 'date', 'time'),
+        db.Index('ix_order_team_date_time', 'team', 'date', 'time'),
+        db.Index('ix_order_member_date', 'member', 'date'),
+        db.Index('ix_order_item_name_date', 'item_name', 'date'),
+        db.Index('ix_order_week_id_team', 'week_id', 'team'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     team = db.Column(db.String(100), nullable=False)
     member = db.Column(db.String(100), nullable=False)
@@ -12,6 +22,164 @@ class Order(db.Model):
     option = db.Column(db.String(100))
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)  # ✅ Add this
+    # Catalog ids (see catalog.py); NULL on rows imported before the catalog existed
+    item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'))
+    option_id = db.Column(db.Integer, db.ForeignKey('menu_option.id'))
+    # weeks.week_index(date): the Sunday-start week the order falls in (see weeks.py)
+    week_id = db.Column(db.Integer)
+    # Menu version (see menu_versions.py) the price was taken from; NULL on older rows
+    menu_version = db.Column(db.Integer)
 
     def __repr__(self):
         return f"<Order {self.member} - {self.item_name} ({self.quantity})>"
+
+class DataVersion(db.Model):
+    # Counters bumped in the same transaction as the writes they track, so caches
+    # compare one row instead of scanning the table (see fragment_cache.py)
+    __tablename__ = 'data_version'
+
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class TeamSpend(db.Model):
+    # Running total of what each team has spent per budget period (see ledger.py)
+    __tablename__ = 'team_spend'
+    __table_args__ = (
+        db.UniqueConstraint('team', 'period', name='uq_team_spend_team_period'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team = db.Column(db.String(100), nullable=False)
+    period = db.Column(db.String(20), nullable=False)
+    total_spent = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<TeamSpend {self.team} {self.period}: {self.total_spent:.2f}>"
+
+class WeeklyRollup(db.Model):
+    # Per-week quantity and spend for each (team, member, item, option), kept current on write
+    __tablename__ = 'weekly_rollup'
+    __table_args__ = (
+        db.UniqueConstraint('week_start', 'team', 'member', 'item_name', 'option',
+                            name='uq_weekly_rollup_key'),
+        db.Index('ix_weekly_rollup_team_week', 'team', 'week_start'),
+        db.Index('ix_weekly_rollup_member_week', 'member', 'week_start'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    week_start = db.Column(db.Date, nullable=False)
+    team = db.Column(db.String(100), nullable=False)
+    member = db.Column(db.String(100), nullable=False)
+    item_name = db.Column(db.String(200), nullable=False)
+    option = db.Column(db.String(100), nullable=False, default='')
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    spend = db.Column(db.Float, nullable=False, default=0.0)
+
+    def __repr__(self):
+        return f"<WeeklyRollup {self.week_start} {self.team} {self.member} - {self.item_name} ({self.quantity})>"
+
+class Cart(db.Model):
+    # Server-side order in progress, one per (team, member); see cart.py
+    __tablename__ = 'cart'
+    __table_args__ = (
+        db.UniqueConstraint('team', 'member', name='uq_cart_team_member'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team = db.Column(db.String(100), nullable=False)
+    member = db.Column(db.String(100), nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    lines = db.relationship('CartLine', cascade='all, delete-orphan',
+                            order_by='CartLine.id', lazy='selectin')
+
+    def __repr__(self):
+        return f"<Cart {self.team} {self.member} ({len(self.lines)} lines)>"
+
+class CartLine(db.Model):
+    __tablename__ = 'cart_line'
+    __table_args__ = (
+        db.UniqueConstraint('cart_id', 'option_id', name='uq_cart_line_option'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    cart_id = db.Column(db.Integer, db.ForeignKey('cart.id', ondelete='CASCADE'), nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    option_id = db.Column(db.Integer, db.ForeignKey('menu_option.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<CartLine option {self.option_id} ({self.quantity})>"
+
+# === Menu catalog: stable ids for what structured_menu.json describes by name ===
+
+class MenuGroup(db.Model):
+    __tablename__ = 'menu_group'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False, unique=True)
+    retired = db.Column(db.Boolean, nullable=False, default=False)
+
+class MenuItem(db.Model):
+    __tablename__ = 'menu_item'
+    __table_args__ = (
+        db.UniqueConstraint('group_id', 'name', name='uq_menu_item_group_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    group_id = db.Column(db.Integer, db.ForeignKey('menu_group.id'), nullable=False)
+    name = db.Column(db.String(200), nullable=False)
+    retired = db.Column(db.Boolean, nullable=False, default=False)
+
+class MenuOption(db.Model):
+    __tablename__ = 'menu_option'
+    __table_args__ = (
+        db.UniqueConstraint('item_id', 'name', name='uq_menu_option_item_name'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
+    name = db.Column(db.String(100), nullable=False)
+    price = db.Column(db.Float, nullable=False)
+    retired = db.Column(db.Boolean, nullable=False, default=False)
+
+class Job(db.Model):
+    # Background export/report run by jobs.py; the artifact lives in the job cache dir
+    __tablename__ = 'job'
+    __table_args__ = (
+        db.Index('ix_job_status_created', 'status', 'created_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    kind = db.Column(db.String(50), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    owner = db.Column(db.String(100))
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    filename = db.Column(db.String(200))
+    mimetype = db.Column(db.String(100))
+    error = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.kind} {self.status}>"
+
+class RosterMember(db.Model):
+    # Roster in the database instead of users.json (ROSTER_SOURCE=db, see identity.py).
+    # team_key/member_key are identity.name_key() of the names; member '' lists an empty team.
+    __tablename__ = 'roster_member'
+    __table_args__ = (
+        db.UniqueConstraint('team_key', 'member_key', name='uq_roster_member_key'),
+        db.Index('ix_roster_member_member_key', 'member_key'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    team = db.Column(db.String(100), nullable=False)
+    member = db.Column(db.String(100), nullable=False)
+    team_key = db.Column(db.String(100), nullable=False)
+    member_key = db.Column(db.String(100), nullable=False)
+    position = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<RosterMember {self.team} {self.member}>"
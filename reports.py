@@ -0,0 +1,287 @@
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from sqlalchemy import and_, func, or_, select
+
+from archive import archived_order_page
+from models import db, Order, WeeklyRollup
+from weeks import grid_weeks, short_date, week_by_id, week_id_of, week_of, weeks_in_year
+
+ORDER_PAGE_SIZE = 100
+MAX_ORDER_PAGE_SIZE = 500
+
+def item_label(item_name, option):
+    return f"{item_name} - {option}".strip(" -")
+
+def weekly_team_totals_stmt():
+    return (
+        select(WeeklyRollup.week_start, WeeklyRollup.team, func.sum(WeeklyRollup.spend))
+        .group_by(WeeklyRollup.week_start, WeeklyRollup.team)
+    )
+
+def weekly_team_totals():
+    """Spend per (year, week of year, team), read from the weekly rollup.
+
+    Returns {year: {week: {team: total}}} holding only the weeks that have orders.
+    """
+    return shape_weekly_team_totals(db.session.execute(weekly_team_totals_stmt()).all())
+
+def shape_weekly_team_totals(rows):
+    totals = {}
+    for start, team, total in rows:
+        week = week_of(start)
+        if week.number < 1 or week.number > weeks_in_year(week.year):
+            continue
+        by_week = totals.setdefault(week.year, {})
+        by_week.setdefault(week.number, {})[team] = (total or 0.0)
+    return totals
+
+def team_item_totals_stmt(team_name, start):
+    return (
+        select(WeeklyRollup.item_name, WeeklyRollup.option,
+               func.sum(WeeklyRollup.quantity), func.sum(WeeklyRollup.spend))
+        .where(WeeklyRollup.team == team_name, WeeklyRollup.week_start == start)
+        .group_by(WeeklyRollup.item_name, WeeklyRollup.option)
+        .order_by(WeeklyRollup.item_name, WeeklyRollup.option)
+    )
+
+def team_item_totals(team_name, start):
+    """{item label: {"qty", "total_cost"}} for one team's week starting on `start`."""
+    return shape_team_item_totals(db.session.execute(team_item_totals_stmt(team_name, start)).all())
+
+def shape_team_item_totals(rows):
+    totals = {}
+    for item_name, option, qty, spend in rows:
+        entry = totals.setdefault(item_label(item_name, option), {"qty": 0, "total_cost": 0.0})
+        entry["qty"] += int(qty or 0)
+        entry["total_cost"] += spend or 0.0
+    return totals
+
+def member_item_totals(member_name, start=None, end=None):
+    """[{"item", "quantity", "spend"}] a member ordered per item and option, from the weekly rollup.
+
+    start/end (dates, either optional) are rounded out to whole Sunday-start weeks.
+    """
+    stmt = (
+        select(WeeklyRollup.item_name, WeeklyRollup.option,
+               func.sum(WeeklyRollup.quantity), func.sum(WeeklyRollup.spend))
+        .where(WeeklyRollup.member == member_name)
+    )
+    if start is not None:
+        stmt = stmt.where(WeeklyRollup.week_start >= week_of(start).start)
+    if end is not None:
+        stmt = stmt.where(WeeklyRollup.week_start <= week_of(end).start)
+
+    rows = db.session.execute(
+        stmt.group_by(WeeklyRollup.item_name, WeeklyRollup.option)
+        .order_by(WeeklyRollup.item_name, WeeklyRollup.option)
+    ).all()
+    return [
+        {"item": item_label(item_name, option), "quantity": int(qty or 0), "spend": spend or 0.0}
+        for item_name, option, qty, spend in rows
+    ]
+
+def member_week_lines(member_name, week):
+    """One member's order lines for `week`, oldest first, off the (member, date) index."""
+    return db.session.execute(
+        select(Order.date, Order.time, Order.item_name, Order.option, Order.quantity, Order.price)
+        .where(Order.member == member_name, Order.date >= week.start, Order.date <= week.end)
+        .order_by(Order.date, Order.time)
+    ).all()
+
+# === All-orders listing (keyset pagination) ===
+
+def encode_order_cursor(row):
+    # Full precision: web orders store microseconds, and a truncated time would skip
+    # every row between the whole second and the boundary row
+    return f"{row.date.isoformat()}|{row.time.isoformat()}|{row.id}"
+
+def decode_order_cursor(cursor):
+    """Parse an `after` cursor; returns None for a missing or malformed one."""
+    try:
+        day, clock, order_id = cursor.split("|")
+        return (date.fromisoformat(day),
+                time.fromisoformat(clock),
+                int(order_id))
+    except (AttributeError, ValueError):
+        return None
+
+def order_filter(year=None, week=None):
+    """WHERE clause for the year/week filters, or None when unset."""
+    if week is not None:
+        return Order.week_id == week_id_of(year or datetime.now().year, week)
+    if year is not None:
+        return and_(Order.date >= date(year, 1, 1), Order.date <= date(year, 12, 31))
+    return None
+
+def order_page_stmt(team=None, member=None, item=None, year=None, week=None,
+                    after=None, limit=ORDER_PAGE_SIZE):
+    """SELECT for one page of orders, newest first, keyed on (date, time, id).
+
+    Fetches one row past `limit` so order_page_result can tell whether there is a next page.
+    """
+    limit = clamp_page_size(limit)
+    stmt = select(Order.id, Order.date, Order.time, Order.week_id, Order.team, Order.member,
+                  Order.item_name, Order.option, Order.quantity)
+
+    if team:
+        stmt = stmt.where(Order.team == team)
+    if member:
+        stmt = stmt.where(Order.member == member)
+    if item:
+        stmt = stmt.where(Order.item_name == item)
+
+    period = order_filter(year, week)
+    if period is not None:
+        stmt = stmt.where(period)
+
+    position = decode_order_cursor(after) if after else None
+    if position is not None:
+        day, clock, order_id = position
+        stmt = stmt.where(or_(
+            Order.date < day,
+            and_(Order.date == day, or_(
+                Order.time < clock,
+                and_(Order.time == clock, Order.id < order_id),
+            )),
+        ))
+
+    return stmt.order_by(Order.date.desc(), Order.time.desc(), Order.id.desc()).limit(limit + 1)
+
+def clamp_page_size(limit):
+    return max(1, min(limit, MAX_ORDER_PAGE_SIZE))
+
+def order_page_result(rows, limit):
+    """(rows, next_cursor) from order_page_stmt's rows; next_cursor is None on the last page."""
+    limit = clamp_page_size(limit)
+    next_cursor = encode_order_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+ORDER_PAGE_COLUMNS = ("id", "date", "time", "week_id", "team", "member", "item_name", "option", "quantity")
+
+def archived_order_page_rows(team=None, member=None, item=None, year=None, week=None,
+                             after=None, limit=ORDER_PAGE_SIZE):
+    """The archived rows order_page_stmt would return if those seasons were still in Order."""
+    position = decode_order_cursor(after) if after else None
+    week_id = week_id_of(year or datetime.now().year, week) if week is not None else None
+    return archived_order_page(ORDER_PAGE_COLUMNS, team=team, member=member, item=item,
+                               year=None if week is not None else year, week_id=week_id,
+                               after=position, limit=clamp_page_size(limit) + 1)
+
+def merge_order_pages(live, archived, limit):
+    """One page from the live and archived pages, newest first on (date, time, id)."""
+    if not archived:
+        return live
+    rows = sorted([*live, *archived], key=lambda r: (r.date, r.time, r.id), reverse=True)
+    return rows[:clamp_page_size(limit) + 1]
+
+def order_page(limit=ORDER_PAGE_SIZE, **filters):
+    rows = db.session.execute(order_page_stmt(limit=limit, **filters)).all()
+    rows = merge_order_pages(rows, archived_order_page_rows(limit=limit, **filters), limit)
+    return order_page_result(rows, limit)
+
+def format_order_row(row):
+    week = week_by_id(row.week_id) if row.week_id is not None else week_of(row.date)
+    return {
+        "date": row.date.strftime("%Y-%m-%d"),
+        "time": row.time.strftime("%I:%M %p"),
+        "week": week.number,
+        "year": week.year,
+        "team": row.team,
+        "member": row.member,
+        "item": item_label(row.item_name, row.option),
+        "quantity": row.quantity
+    }
+
+# === Report pages ===
+# A page is the SELECTs it needs plus a function turning their rows into template
+# context. app.py runs them on the Flask-SQLAlchemy session and asgi.py on an async
+# engine, so both serve identical pages (and share fragment cache entries).
+
+ReportPage = namedtuple("ReportPage", "key template queries shape")
+
+def weekly_summary_page(week):
+    def shape(orders):
+        return {
+            "week_range": week.label,
+            "orders": [{
+                "date": short_date(o.date),
+                "team": o.team,
+                "item": item_label(o.item_name, o.option),
+                "quantity": o.quantity
+            } for o in orders],
+        }
+
+    stmt = (
+        select(Order.date, Order.team, Order.item_name, Order.option, Order.quantity)
+        .where(Order.week_id == week.id)
+        .order_by(Order.date.desc(), Order.time.desc())
+    )
+    return ReportPage(("weekly_summary", week.id), "weekly_summary.html", {"orders": stmt}, shape)
+
+def produce_hyvee_page(week, items):
+    def shape(orders):
+        return {
+            "week_range": week.label,
+            "orders": [(short_date(o.date), o.team, o.item_name, o.quantity) for o in orders],
+        }
+
+    stmt = (
+        select(Order.date, Order.team, Order.item_name, Order.quantity)
+        .where(Order.week_id == week.id, Order.item_name.in_(items))
+        .order_by(Order.date.desc())
+    )
+    return ReportPage(("produce_hyvee", week.id, items), "admin_produce_hyvee.html", {"orders": stmt}, shape)
+
+def team_orders_page(team_name, week, budget):
+    def shape(orders, totals):
+        # Weekly orders grouped by member
+        orders_by_member = {}
+        for o in orders:
+            subtotal = o.quantity * o.price
+            entry = orders_by_member.setdefault(o.member, {"orders": [], "total": 0.0})
+            entry["orders"].append({
+                "date": o.date.strftime("%Y-%m-%d"),
+                "time": o.time.strftime("%I:%M %p"),
+                "item": item_label(o.item_name, o.option),
+                "quantity": o.quantity,
+                "price": f"${o.price:.2f}",
+                "subtotal": f"${subtotal:.2f}"
+            })
+            entry["total"] += subtotal
+
+        # Per-item totals for the week come straight from the weekly rollup
+        all_totals = shape_team_item_totals(totals)
+        total_cost = sum(v["total_cost"] for v in all_totals.values())
+        return {
+            "team_name": team_name,
+            "week_range": week.label,
+            "weekly_orders_by_member": orders_by_member,
+            "total_orders": all_totals,
+            "total_cost": total_cost,
+            "user_budget": budget,
+            "remaining_budget": budget - total_cost,
+        }
+
+    orders = (
+        select(Order.date, Order.time, Order.member, Order.item_name, Order.option,
+               Order.quantity, Order.price)
+        .where(Order.week_id == week.id, Order.team == team_name)
+        .order_by(Order.date, Order.time)
+    )
+    return ReportPage(("team_orders", team_name, week.id, budget), "team_orders.html",
+                      {"orders": orders, "totals": team_item_totals_stmt(team_name, week.start)}, shape)
+
+def weekly_totals_page(year, users):
+    def shape(totals):
+        yearly_totals_by_week = shape_weekly_team_totals(totals)
+        # Always show this year's columns, even before the first order lands
+        yearly_totals_by_week.setdefault(year, {})
+        return {
+            "yearly_totals_by_week": yearly_totals_by_week,
+            "users": users,
+            "weeks": grid_weeks(year, yearly_totals_by_week),
+        }
+
+    return ReportPage(("weekly_totals", year, tuple(users)), "weekly_totals.html",
+                      {"totals": weekly_team_totals_stmt()}, shape)
@@ -0,0 +1,41 @@
+from sqlalchemy import inspect, text
+
+from models import db
+
+def upgrade_schema():
+    """Bring an existing database up to the current models.
+
+    db.create_all() only creates missing tables; it never touches tables that
+    already exist. This also adds any nullable columns and declared indexes
+    those tables are missing. Returns a description of each change made.
+    """
+    db.create_all()
+
+    engine = db.engine
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    changes = []
+
+    for table in db.metadata.sorted_tables:
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            if not column.nullable:
+                raise RuntimeError(
+                    f"Cannot add NOT NULL column {table.name}.{column.name} to an existing table"
+                )
+            with engine.begin() as conn:
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} "
+                    f"ADD COLUMN {preparer.format_column(column)} {column.type.compile(engine.dialect)}"
+                ))
+            changes.append(f"column {table.name}.{column.name}")
+
+        existing_indexes = {ix["name"] for ix in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(engine)
+                changes.append(f"index {index.name}")
+
+    return changes
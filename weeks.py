@@ -0,0 +1,108 @@
+from collections import namedtuple
+from datetime import date, timedelta
+from functools import lru_cache
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import Integer
+
+# Weeks run Sunday through Saturday (see current_week below). Week
+# indexes count whole weeks from this Sunday, which predates any order, so the
+# SQL below can use plain integer division without worrying about negatives.
+WEEK_EPOCH = date(1899, 12, 31)
+
+# Years whose weeks are precomputed on first use; weeks outside are built on demand
+CALENDAR_YEARS = (2020, 2040)
+
+def week_index(day):
+    return (day - WEEK_EPOCH).days // 7
+
+def week_start(day):
+    return day - timedelta(days=(day.weekday() + 1) % 7)
+
+def week_number(index, year):
+    # Week 1 of a year is the Sunday-start week containing January 1st
+    return index - week_index(date(year, 1, 1)) + 1
+
+def year_of_week(start):
+    # A week that straddles New Year counts as week 1 of the year it ends in
+    return (start + timedelta(days=6)).year
+
+def week_start_from_index(index):
+    return WEEK_EPOCH + timedelta(weeks=index)
+
+
+# === Week table ===
+
+# id is week_index(start), the value stored in Order.week_id
+Week = namedtuple("Week", "id start end year number label")
+
+@lru_cache(maxsize=4096)
+def short_date(day):
+    # m/d/yy as shown on every page; report rows repeat a handful of dates, so cache them
+    return day.strftime('%-m/%-d/%y')
+
+def _build_week(index):
+    start = week_start_from_index(index)
+    end = start + timedelta(days=6)
+    year = year_of_week(start)
+    label = f"{short_date(start)} - {short_date(end)}"
+    return Week(index, start, end, year, week_number(index, year), label)
+
+_FIRST_ID = week_index(date(CALENDAR_YEARS[0], 1, 1))
+
+@lru_cache(maxsize=None)
+def _week_table():
+    # Built on the first lookup rather than at import, so processes that never
+    # show a week (CLI commands, worker boot) don't pay for ~1,100 labels
+    return [_build_week(i) for i in range(_FIRST_ID, week_index(date(CALENDAR_YEARS[1], 12, 31)) + 1)]
+
+def week_by_id(index):
+    weeks = _week_table()
+    offset = index - _FIRST_ID
+    if 0 <= offset < len(weeks):
+        return weeks[offset]
+    return _build_week(index)
+
+def week_of(day):
+    return week_by_id(week_index(day))
+
+def current_week():
+    return week_of(date.today())
+
+def week_id_of(year, number):
+    return week_index(date(year, 1, 1)) + number - 1
+
+def weeks_in_year(year):
+    # 52, or 53 when the year has a 53rd Sunday-start week (2022, 2028, 2033, ...)
+    return week_id_of(year + 1, 1) - week_id_of(year, 1)
+
+def weeks_of_year(year):
+    """Weeks 1..52 (or 53) of `year`."""
+    first = week_id_of(year, 1)
+    return [week_by_id(first + i) for i in range(weeks_in_year(year))]
+
+def grid_weeks(year, years=()):
+    """Rows of the weekly totals grid: the weeks of `year`, plus week 53 of any of `years` that has one."""
+    weeks = weeks_of_year(year)
+    longest = max(years, key=weeks_in_year, default=year)
+    return weeks + weeks_of_year(longest)[len(weeks):]
+
+
+class week_index_of(FunctionElement):
+    """SQL counterpart of week_index() for a Date column."""
+    type = Integer()
+    inherit_cache = True
+    name = 'week_index_of'
+
+
+@compiles(week_index_of)
+def _week_index_default(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"(({column} - DATE '{WEEK_EPOCH.isoformat()}') / 7)"
+
+
+@compiles(week_index_of, 'sqlite')
+def _week_index_sqlite(element, compiler, **kw):
+    column = compiler.process(element.clauses, **kw)
+    return f"(CAST(julianday({column}) - julianday('{WEEK_EPOCH.isoformat()}') AS INTEGER) / 7)"